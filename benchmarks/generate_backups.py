@@ -0,0 +1,221 @@
+"""
+Generate synthetic ".jwlibrary" backups for the merge benchmarks.
+
+The backups are built from the template "src/userData.db", so they have the same schema as the
+backups written by JW Library. Every backup is generated from its own seed; tags, locations and
+media files are drawn either from a pool shared by all the backups (the collisions the merge has to
+resolve) or from a pool unique to the backup, according to the collision rate.
+
+Example of use:
+    python benchmarks/generate_backups.py --count 10 --output-dir /tmp/backups
+"""
+import os
+import sys
+import json
+import random
+import hashlib
+import zipfile
+import argparse
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.load_user_data import load_template_database
+
+# One tick is 100 nanoseconds
+TICKS_PER_SECOND = 10_000_000
+
+
+def shared_or_unique(rng, collision_rate, seed, index):
+    """
+    Return the key of an item of the backup: the same key in every backup for shared items,
+    a key of this backup only for the others.
+    """
+    if rng.random() < collision_rate:
+        return f"shared-{index}"
+    return f"{seed}-{index}"
+
+
+def media_content(key, media_size):
+    """
+    Return the content of a media file. The same key always gives the same content,
+    so shared media files have the same hash in every backup.
+    """
+    return random.Random(key).randbytes(media_size)
+
+
+def generate_backup(file_path, seed=0, playlists=10, markers=3, verse_maps=2, tags=2, locations=5,
+                    media_files=5, media_size=16 * 1024, collision_rate=0.5):
+    """
+    Write a synthetic ".jwlibrary" backup.
+
+    Parameters:
+        file_path (str): Path to the ".jwlibrary" file to be created.
+        seed (int, optional): Seed of the backup. Backups with different seeds have different unique items.
+        playlists (int, optional): Number of playlist items.
+        markers (int, optional): Number of markers of each playlist item.
+        verse_maps (int, optional): Number of Bible verses of each marker.
+        tags (int, optional): Number of tags (playlists). Every playlist item goes into one of them.
+        locations (int, optional): Number of locations (publication videos).
+        media_files (int, optional): Number of media files (independent media).
+        media_size (int, optional): Size in bytes of every media file.
+        collision_rate (float, optional): Fraction of the tags, locations and media files taken from
+            the pool shared by all the backups.
+
+    Description:
+        Half of the playlist items point to a location and the other half to a media file, which is
+        also used as their thumbnail. Shared media files have the same content, and so the same hash,
+        in every backup, but each backup stores them under its own file name, as different devices do.
+    """
+    rng = random.Random(seed)
+    conn = load_template_database()
+    cursor = conn.cursor()
+
+    tag_ids = []
+    for index in range(max(tags, 1)):
+        key = shared_or_unique(rng, collision_rate, seed, index)
+        cursor.execute("INSERT INTO Tag (TagId, Type, Name) VALUES (?, 2, ?)", (index + 1, f"Playlist {key}"))
+        tag_ids.append(index + 1)
+
+    location_ids = []
+    for index in range(locations):
+        key = shared_or_unique(rng, collision_rate, seed, index)
+        document_id = int(hashlib.sha256(key.encode()).hexdigest()[:7], 16) + 1
+        cursor.execute(
+            "INSERT INTO Location (LocationId, DocumentId, Track, IssueTagNumber, KeySymbol, MepsLanguage, Type, Title)"
+            " VALUES (?, ?, 1, 0, 'pub', 0, 2, ?)",
+            (index + 1, document_id, f"Video {key}"))
+        location_ids.append(index + 1)
+
+    media = {}
+    for index in range(media_files):
+        key = shared_or_unique(rng, collision_rate, seed, index)
+        content = media_content(key, media_size)
+        file_name = hashlib.sha256(f"{seed}-{key}".encode()).hexdigest()[:32]
+        cursor.execute(
+            "INSERT INTO IndependentMedia (IndependentMediaId, OriginalFilename, FilePath, MimeType, Hash) VALUES (?, ?, ?, 'video/mp4', ?)",
+            (index + 1, f"{key}.mp4", file_name, hashlib.sha256(content).hexdigest()))
+        media[index + 1] = (file_name, content)
+
+    media_ids = list(media)
+    positions = {}
+    marker_id = 0
+    for index in range(playlists):
+        playlist_item_id = index + 1
+        use_media = bool(media_ids) and (index % 2 == 1 or not location_ids)
+        media_id = rng.choice(media_ids) if use_media else None
+        thumbnail = media[media_id][0] if media_id else None
+        cursor.execute(
+            "INSERT INTO PlaylistItem (PlaylistItemId, Label, StartTrimOffsetTicks, EndTrimOffsetTicks, Accuracy, EndAction, ThumbnailFilePath)"
+            " VALUES (?, ?, NULL, NULL, 1, 0, ?)",
+            (playlist_item_id, f"Item {seed}-{index}", thumbnail))
+
+        if media_id:
+            cursor.execute("INSERT INTO PlaylistItemIndependentMediaMap (PlaylistItemId, IndependentMediaId, DurationTicks) VALUES (?, ?, ?)",
+                           (playlist_item_id, media_id, 60 * TICKS_PER_SECOND))
+        elif location_ids:
+            cursor.execute("INSERT INTO PlaylistItemLocationMap (PlaylistItemId, LocationId, MajorMultimediaType, BaseDurationTicks) VALUES (?, ?, 2, ?)",
+                           (playlist_item_id, rng.choice(location_ids), 60 * TICKS_PER_SECOND))
+
+        tag_id = rng.choice(tag_ids)
+        position = positions.get(tag_id, 0)
+        positions[tag_id] = position + 1
+        cursor.execute("INSERT INTO TagMap (TagMapId, PlaylistItemId, TagId, Position) VALUES (?, ?, ?, ?)",
+                       (playlist_item_id, playlist_item_id, tag_id, position))
+
+        for marker in range(markers):
+            marker_id += 1
+            cursor.execute(
+                "INSERT INTO PlaylistItemMarker (PlaylistItemMarkerId, PlaylistItemId, Label, StartTimeTicks, DurationTicks, EndTransitionDurationTicks)"
+                " VALUES (?, ?, ?, ?, ?, 0)",
+                (marker_id, playlist_item_id, f"Marker {marker + 1}", marker * 10 * TICKS_PER_SECOND, 10 * TICKS_PER_SECOND))
+            for verse_id in rng.sample(range(1, 31103), verse_maps):
+                cursor.execute("INSERT INTO PlaylistItemMarkerBibleVerseMap (PlaylistItemMarkerId, VerseId) VALUES (?, ?)", (marker_id, verse_id))
+
+    conn.commit()
+    data = conn.serialize()
+    conn.close()
+
+    now = datetime.datetime.now().isoformat()
+    manifest = {
+        "name": os.path.basename(file_path),
+        "creationDate": now,
+        "version": 1,
+        "type": 0,
+        "userDataBackup": {
+            "lastModifiedDate": now,
+            "deviceName": f"benchmark-{seed}",
+            "databaseName": "userData.db",
+            "hash": hashlib.sha256(data).hexdigest(),
+            "schemaVersion": 11,
+        },
+    }
+
+    with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr("manifest.json", json.dumps(manifest))
+        zip_file.writestr("userData.db", data)
+        for file_name, content in media.values():
+            zip_file.writestr(file_name, content)
+
+
+def generate_backups(output_dir, count, **options):
+    """
+    Write 'count' synthetic backups to 'output_dir', with the seeds 1 to 'count'.
+
+    Parameters:
+        output_dir (str): Folder where the backups are written.
+        count (int): Number of backups.
+        **options: Options passed to 'generate_backup'.
+
+    Returns:
+        list: Paths to the backups.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    file_paths = []
+    for seed in range(1, count + 1):
+        file_path = os.path.join(output_dir, f"backup_{seed:04d}.jwlibrary")
+        generate_backup(file_path, seed=seed, **options)
+        file_paths.append(file_path)
+    return file_paths
+
+
+def add_generator_arguments(parser):
+    """
+    Add the options of the generator to a command line parser.
+    """
+    parser.add_argument("--playlists", type=int, default=10, help="playlist items per backup")
+    parser.add_argument("--markers", type=int, default=3, help="markers per playlist item")
+    parser.add_argument("--verse-maps", type=int, default=2, help="Bible verses per marker")
+    parser.add_argument("--tags", type=int, default=2, help="tags (playlists) per backup")
+    parser.add_argument("--locations", type=int, default=5, help="locations per backup")
+    parser.add_argument("--media-files", type=int, default=5, help="media files per backup")
+    parser.add_argument("--media-size", type=int, default=16 * 1024, help="size in bytes of every media file")
+    parser.add_argument("--collision-rate", type=float, default=0.5,
+                        help="fraction of the tags, locations and media files shared by all the backups")
+
+
+def generator_options(args):
+    """
+    Return the options of 'generate_backup' given in the command line.
+    """
+    return {
+        "playlists": args.playlists,
+        "markers": args.markers,
+        "verse_maps": args.verse_maps,
+        "tags": args.tags,
+        "locations": args.locations,
+        "media_files": args.media_files,
+        "media_size": args.media_size,
+        "collision_rate": args.collision_rate,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic .jwlibrary backups for the merge benchmarks.")
+    parser.add_argument("--count", type=int, default=2, help="number of backups")
+    parser.add_argument("--output-dir", default="synthetic_backups", help="folder where the backups are written")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    paths = generate_backups(args.output_dir, args.count, **generator_options(args))
+    print(f"{len(paths)} backups written to '{args.output_dir}'.")
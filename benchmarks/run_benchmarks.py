@@ -0,0 +1,169 @@
+"""
+Benchmark the merge of synthetic backups.
+
+For every number of sources and every merge mode, the script generates the backups, runs the full
+main.py pipeline in a scratch copy of the program with "--report", and saves the total time and the
+time, rows and bytes of every stage, including each table merge, to a JSON results file. A previous
+results file can be given with "--compare" to flag the stages that got slower.
+
+Example of use:
+    python benchmarks/run_benchmarks.py --sources 2 10 100
+    python benchmarks/run_benchmarks.py --sources 2 10 100 --compare benchmarks/results/benchmark-20260101-120000.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import subprocess
+
+from generate_backups import generate_backups, add_generator_arguments, generator_options
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+
+# Command line options of main.py for each merge mode
+MODES = {
+    "rows": [],
+    "attach": ["--attach"],
+    "in-memory": ["--in-memory"],
+    "attach-in-memory": ["--attach", "--in-memory"],
+}
+
+
+def prepare_workspace(workspace, backups):
+    """
+    Copy main.py, the "src" folder and the backups to a scratch folder, where main.py can run
+    without touching the backups of the repository.
+    """
+    os.makedirs(workspace)
+    shutil.copy(os.path.join(ROOT_DIR, "main.py"), workspace)
+    shutil.copytree(os.path.join(ROOT_DIR, "src"), os.path.join(workspace, "src"),
+                    ignore=shutil.ignore_patterns("__pycache__"))
+    for backup in backups:
+        # Hard links avoid copying the backups for every run
+        try:
+            os.link(backup, os.path.join(workspace, os.path.basename(backup)))
+        except OSError:
+            shutil.copy(backup, workspace)
+
+
+def run_pipeline(workspace, mode):
+    """
+    Run main.py in the scratch folder and return its timings.
+
+    Returns:
+        dict: The total wall time of the process and the stages of the profiling report of main.py.
+    """
+    report_path = os.path.join(workspace, "merge_report.json")
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "main.py", "--report", report_path] + MODES[mode],
+                   cwd=workspace, check=True, stdout=subprocess.DEVNULL)
+    wall_time = time.perf_counter() - start
+
+    with open(report_path, 'r', encoding='utf-8') as report_file:
+        report = json.load(report_file)
+    return {
+        "wall_time": round(wall_time, 6),
+        "output_size": os.path.getsize(os.path.join(workspace, "merged_playlist.jwlibrary")),
+        "stages": report["stages"],
+    }
+
+
+def git_commit():
+    """
+    Return the commit of the repository being benchmarked, or None outside a git checkout.
+    """
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(previous, current, threshold):
+    """
+    Print the stages that got slower than 'threshold' times their previous time.
+
+    Returns:
+        int: Number of regressions found.
+    """
+    def timings(results):
+        found = {}
+        for run in results["runs"]:
+            key = (run["sources"], run["mode"])
+            found[key + ("total",)] = run["wall_time"]
+            for stage in run["stages"]:
+                found[key + (stage["stage"],)] = stage["wall_time"]
+        return found
+
+    previous_timings = timings(previous)
+    regressions = 0
+    for key, wall_time in timings(current).items():
+        previous_time = previous_timings.get(key)
+        # Stages that take less than a millisecond are too noisy to compare
+        if not previous_time or max(previous_time, wall_time) < 0.001:
+            continue
+        ratio = wall_time / previous_time
+        if ratio > threshold:
+            regressions += 1
+            sources, mode, stage = key
+            print(f"REGRESSION {sources} sources, {mode}, {stage}: {previous_time:.4f}s -> {wall_time:.4f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the merge of synthetic .jwlibrary backups.")
+    parser.add_argument("--sources", type=int, nargs="+", default=[2, 10, 100, 1000], help="numbers of backups to merge")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES), help="merge modes to benchmark")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/benchmark-<date>.json)")
+    parser.add_argument("--compare", metavar="FILE", help="previous results file to compare with")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown ratio reported as a regression by --compare (default: 1.25)")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    options = generator_options(args)
+    results = {
+        "created": datetime.datetime.now().isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "generator": options,
+        "runs": [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix="jwlibrary-benchmark-") as scratch_dir:
+        for sources in args.sources:
+            print(f"Generating {sources} backups...")
+            backups = generate_backups(os.path.join(scratch_dir, f"backups-{sources}"), sources, **options)
+
+            for mode in args.modes:
+                workspace = os.path.join(scratch_dir, f"run-{sources}-{mode}")
+                prepare_workspace(workspace, backups)
+                run = run_pipeline(workspace, mode)
+                shutil.rmtree(workspace)
+
+                results["runs"].append({"sources": sources, "mode": mode, **run})
+                print(f"{sources:>5} sources  {mode:<17} {run['wall_time']:8.3f}s")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"benchmark-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as results_file:
+        json.dump(results, results_file, indent=4)
+    print(f"Results written to '{output}'.")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as previous_file:
+            regressions = compare_results(json.load(previous_file), results, args.threshold)
+        print(f"{regressions} regressions found.")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
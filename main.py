@@ -1,51 +1,58 @@
+import argparse
 import os
 import shutil
 import sqlite3
-import random
+import sys
+import tempfile
 import zipfile
-import datetime
-import socket
-import json
-
-from src.utils import count_db
-from src.merge_table_tag import merge_table_tag
-from src.merge_table_independent_media import merge_table_independent_media
-from src.merge_table_playlist_item import merge_table_playlist_item
-from src.merge_table_playlist_item_marker import merge_table_playlist_item_marker
-from src.merge_table_playlist_item_marker_bible_verse_map import merge_table_playlist_item_marker_bible_verse_map
-from src.merge_table_playlist_item_location_map import merge_table_playlist_item_location_map
-from src.merge_table_playlist_item_independent_media_map import merge_table_playlist_item_independent_media_map
-from src.merge_table_tag_map import merge_table_tag_map
-from src.merge_table_location import merge_table_location
-from src.merge_table_last_modified import update_last_modified
-from src.insert_into_playlist_item_accuracy import insert_into_playlist_item_accuracy
-from src.create_manifest_json import create_update_manifest_file
+
+from src.utils import open_db_folder
+from src.id_remapper import IdRemapper
+from src.merger import Merger, merge_sources
+from src.batch import load_batch_manifest, run_batch
 from src.zip_merged_folder import zip_merged_folder
+from src.template_schema import template_schema
+from src.merge_journal import journal_path_for, load_journal, new_journal, merged_hashes, record_sources, save_journal, discard_journal, file_sha256
+from src.profiler import start_profiling, stage, record
+from src.merge_planner import plan_merge, print_merge_plan
+from src.select_playlist_items import PlaylistSelection, matches
 
-def find_jwlibrary_files():
-    # Get the root directory of the program
-    root_dir = os.path.dirname(os.path.abspath(__file__))
+# Name of the merged archive written by the program
+MERGED_ARCHIVE = "merged_playlist.jwlibrary"
 
-    # List all ".jwlibrary" files in the root directory
-    jwlibrary_files = [file for file in os.listdir(root_dir) if file.endswith(".jwlibrary")]
+def find_jwlibrary_files(input_paths, output=None):
+    # The backups given as files are merged as they are; in the folders, every ".jwlibrary" file
+    # is merged, except the result of a previous merge
+    excluded = {os.path.abspath(output)} if output else set()
+    jwlibrary_files = []
+    for input_path in input_paths:
+        if os.path.isdir(input_path):
+            # Sorted, so the merge order and the IDs of the merged records do not depend on the file system
+            for file in sorted(os.listdir(input_path)):
+                file_path = os.path.join(input_path, file)
+                if file.endswith(".jwlibrary") and file != MERGED_ARCHIVE and os.path.abspath(file_path) not in excluded:
+                    jwlibrary_files.append(file_path)
+        elif os.path.isfile(input_path):
+            jwlibrary_files.append(input_path)
+        else:
+            print(f"Arquivo não encontrado: {input_path}")
 
     if jwlibrary_files:
-        print("Arquivos .jwlibrary encontrados na raiz do programa:")
-        for file in jwlibrary_files:
-            print(file)
-
-        # Extract the contents of the ".jwlibrary" files
-        extract_jwlibrary_files([os.path.join(root_dir, file) for file in jwlibrary_files])
+        print("Arquivos .jwlibrary encontrados:")
+        for file_path in jwlibrary_files:
+            print(file_path)
     else:
-        print("Nenhum arquivo .jwlibrary encontrado na raiz do programa.")
+        print("Nenhum arquivo .jwlibrary encontrado.")
 
-def extract_jwlibrary_files(file_paths):
-    # Get the root directory of the program
-    root_dir = os.path.dirname(os.path.abspath(__file__))
+    return jwlibrary_files
 
-    # Directories to store extracted database files and merged files
-    db_dir = os.path.join(root_dir, "DB")
-    merged_dir = os.path.join(root_dir, "merged")
+def extract_jwlibrary_files(file_paths, work_dir, databases=True, media=True, skipped_files=()):
+    # The databases are extracted before the merge and the media after it, so the media files
+    # the merged database does not refer to ('skipped_files') are never read from the archives
+
+    # Directories of the scratch folder to store extracted database files and merged files
+    db_dir = os.path.join(work_dir, "DB")
+    merged_dir = os.path.join(work_dir, "merged")
     os.makedirs(db_dir, exist_ok=True)
     os.makedirs(merged_dir, exist_ok=True)
 
@@ -59,6 +66,9 @@ def extract_jwlibrary_files(file_paths):
                 file_name = os.path.basename(file_info.filename)
 
                 # Extract and organize the files based on their types
+                is_database = file_name.endswith(".db")
+                if (is_database and not databases) or (not is_database and not media) or file_name in skipped_files:
+                    continue
                 if file_name == "userData.db":
                     count = 1
                     while True:
@@ -78,45 +88,193 @@ def extract_jwlibrary_files(file_paths):
                     # Copy the contents of the files to their respective locations
                     shutil.copyfileobj(source, target)
 
+def merge_in_memory(jwlibrary_files, output, attach=False, workers=None, incremental=False, selection=None):
+    """
+    Merge the backups straight from the archives into memory and write the merged archive and its journal.
+
+    Parameters:
+        jwlibrary_files (list): Paths to the ".jwlibrary" files, in merge order.
+        output (str): Path of the merged archive.
+        attach (bool, optional): Merge with ATTACH DATABASE and INSERT ... SELECT.
+        workers (int, optional): Number of processes that read the backups, and of threads that merge the independent tables.
+        incremental (bool, optional): Add only the new backups to the existing merged archive.
+        selection (PlaylistSelection, optional): Merge only these playlist items and the records they need.
+
+    Description:
+        Every run writes a merge journal next to the merged archive, with the SHA-256 of each merged
+        backup and the IDs its records received, except the runs with a 'selection': their archive holds
+        only some playlist items of the backups, which the journal cannot tell. In incremental mode, the existing merged archive is
+        loaded in place of the template database, the backups listed in the journal are left out, and
+        the media of the existing archive are copied before the ones of the new backups.
+    """
+    journal_path = journal_path_for(output)
+    journal = None
+    if incremental and os.path.exists(output):
+        journal = load_journal(journal_path)
+        if journal is None:
+            print(f"No merge journal found for '{output}'. Merging all the backups from the start.")
+
+    # Leave out the backups that are already in the merged archive, and copies of the same backup
+    known_hashes = merged_hashes(journal) if journal else set()
+    new_files = []
+    with stage("hash"):
+        for file_path in jwlibrary_files:
+            sha256 = file_sha256(file_path)
+            record(bytes_in=os.path.getsize(file_path))
+            if sha256 in known_hashes:
+                print(f"{os.path.basename(file_path)} was already merged. Skipping...")
+                continue
+            known_hashes.add(sha256)
+            new_files.append((file_path, sha256))
+
+    if not new_files:
+        print("No new backups to merge.")
+        return
+
+    with Merger(attach, workers, selection=selection) as merger:
+        # Read and validate every new backup in parallel
+        with stage("ingest"):
+            snapshots = merger.ingest([file_path for file_path, _ in new_files])
+            record(bytes_in=sum(os.path.getsize(file_path) for file_path, _ in new_files),
+                   bytes_out=sum(len(snapshot.data) for snapshot in snapshots))
+        if not snapshots:
+            return
+
+        # Merge the tables in the order of the files and write the final ".jwlibrary" file straight from memory
+        remapper = IdRemapper()
+        merger.merge_snapshots(snapshots, output, base=output if journal else None, remapper=remapper)
+
+    if selection is not None:
+        print("No merge journal is written for a merge of selected playlist items.")
+        return
+
+    journal = journal or new_journal()
+    hashes = dict(new_files)
+    record_sources(journal, [(snapshot.name, hashes[snapshot.file_path]) for snapshot in snapshots], remapper)
+    save_journal(journal, journal_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge .jwlibrary backups into a single archive.")
+    parser.add_argument("inputs", nargs="*", metavar="PATH",
+                        help="backups to merge, or folders whose .jwlibrary files are merged (default: the current folder)")
+    parser.add_argument("--attach", action="store_true",
+                        help="merge with ATTACH DATABASE and INSERT ... SELECT instead of copying the records one by one")
+    parser.add_argument("--in-memory", action="store_true",
+                        help="load the databases straight from the archives into memory, without the DB and merged folders")
+    parser.add_argument("--incremental", action="store_true",
+                        help="add only the new backups to the existing merged archive, using its merge journal (implies --in-memory)")
+    parser.add_argument("--output", default=MERGED_ARCHIVE,
+                        help=f"path of the merged archive (default: {MERGED_ARCHIVE} in the current folder)")
+    parser.add_argument("--batch", metavar="MANIFEST",
+                        help="merge every group of a JSON or CSV manifest (output -> inputs) into its own archive, instead of the given backups")
+    parser.add_argument("--tag", action="append", default=[], metavar="NAME",
+                        help="merge only the playlist items of the tags or playlists with this name (shell patterns such as 'Meeting*' are accepted; can be repeated)")
+    parser.add_argument("--label", action="append", default=[], metavar="PATTERN",
+                        help="merge only the playlist items whose label matches this shell pattern (can be repeated)")
+    parser.add_argument("--source", action="append", default=[], metavar="PATTERN",
+                        help="merge only the backups whose file name matches this shell pattern (can be repeated)")
+    parser.add_argument("--plan", action="store_true",
+                        help="print the records, collisions, remaps, duplicate media and size the merge would give, without merging or writing anything")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of processes that read the backups with --in-memory or merge the groups with --batch, and of threads that compress the merged archive (default: number of CPUs); when given, also the number of threads that merge independent tables (default: one at a time)")
+    parser.add_argument("--report", metavar="FILE",
+                        help="write a JSON report with the time, CPU time, rows and bytes of every stage and table")
+    parser.add_argument("--profile-dir", metavar="DIR",
+                        help="write a cProfile file for every stage to this folder (also writes the report, by default to DIR/merge_report.json)")
+    args = parser.parse_args()
+    if args.incremental and (args.tag or args.label):
+        parser.error("--tag and --label cannot be used with --incremental, since the journal would list the backups as fully merged")
+
+    if not args.report and not args.profile_dir:
+        run(args)
+        return
+
+    profiler = start_profiling(args.profile_dir)
+    try:
+        run(args)
+    finally:
+        profiler.write_report(args.report or os.path.join(args.profile_dir, "merge_report.json"))
+
+def run(args):
+    """
+    Run the merge with the options given in the command line.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command line options.
+    """
+    if args.batch:
+        # Merge every group of the manifest in a pool of processes, each with its own template and merged database
+        with stage("batch"):
+            failed = run_batch(load_batch_manifest(args.batch), args.workers, args.attach)
+        if failed:
+            # Scripts and CI jobs can tell that some groups were not merged
+            sys.exit(1)
+        return
+
+    # Step 1: Find JW Library files in the given paths, by default in the current folder
+    with stage("find"):
+        jwlibrary_files = find_jwlibrary_files(args.inputs or [os.getcwd()], args.output)
+        if args.source:
+            jwlibrary_files = [file_path for file_path in jwlibrary_files if matches(os.path.basename(file_path), args.source)]
+            print(f"{len(jwlibrary_files)} backups match {', '.join(args.source)}.")
+    if not jwlibrary_files:
+        return
+
+    # Playlist items to be merged, instead of every record of the backups
+    selection = PlaylistSelection(tuple(args.tag), tuple(args.label)) if args.tag or args.label else None
+
+    if args.plan:
+        # Step 2: Estimate the merge from the key columns of the backups, without writing anything
+        with stage("plan"):
+            print_merge_plan(plan_merge(jwlibrary_files, selection))
+        return
+
+    if args.in_memory or args.incremental:
+        # Step 2: Merge the backups in memory and write the final ".jwlibrary" file and its journal
+        merge_in_memory(jwlibrary_files, args.output, args.attach, args.workers, args.incremental, selection)
+        return
+
+    # The "DB" and "merged" folders are created in a temporary folder, so the program never writes
+    # next to its own files, which may be read-only once it is installed
+    pasta_temporaria = tempfile.TemporaryDirectory(prefix="jwlibrary_merge_")
+    try:
+        # Step 2: Extract the databases of the ".jwlibrary" files and create "userData.db" in the "merged" folder from the template
+        with stage("extract"):
+            extract_jwlibrary_files(jwlibrary_files, pasta_temporaria.name, media=False)
+            record(bytes_in=sum(os.path.getsize(file_path) for file_path in jwlibrary_files))
+
+        # Step 3: Define the paths for the "DB" and "merged" directories
+        pasta_db = os.path.join(pasta_temporaria.name, "DB")
+        pasta_mesclada = os.path.join(pasta_temporaria.name, "merged")
+        merged_user_data_db = os.path.join(pasta_mesclada, "userData.db")
+        with stage("template"):
+            template_schema().instantiate_file(merged_user_data_db)
+
+        # Step 4: Merge the tables from the "DB" directory into the "merged" directory,
+        # update the "LastModified" table and insert data into the "PlaylistItemAccuracy" table
+        merged_conn = sqlite3.connect(merged_user_data_db)
+        try:
+            with stage("merge"):
+                skipped_files = merge_sources(open_db_folder(pasta_db), merged_conn, args.attach, workers=args.workers, selection=selection)
+        finally:
+            merged_conn.close()
+
+        # Extract only the media files the merged database refers to: identical files are kept only once,
+        # and the files of the pruned media records are not extracted at all
+        with stage("extract media"):
+            extract_jwlibrary_files(jwlibrary_files, pasta_temporaria.name, databases=False, skipped_files=skipped_files)
+
+        # Step 5: Zip the "merged" folder to create the final ".jwlibrary" file, with a "manifest.json"
+        # holding the hash of "userData.db" computed while it is zipped
+        with stage("zip"):
+            # The folder mode writes no journal, so the one of a previous merge into the same archive is removed
+            discard_journal(args.output)
+            zip_merged_folder(pasta_mesclada, args.output, args.workers)
+            record(bytes_out=os.path.getsize(args.output))
+    finally:
+        # Step 6: Cleanup - remove the temporary folder with the "DB" and "merged" directories, also when the merge fails
+        with stage("cleanup"):
+            pasta_temporaria.cleanup()
+
 if __name__ == "__main__":
-    # Step 1: Find JW Library files in the root directory and extract their contents
-    find_jwlibrary_files()
-
-    # Step 2: Copy "userData.db" from the "src" folder to the "merged" folder
-    root_dir = os.path.dirname(os.path.abspath(__file__))
-    src_user_data_db = os.path.join(root_dir, "src", "userData.db")
-    merged_user_data_db = os.path.join(root_dir, "merged", "userData.db")
-    shutil.copy(src_user_data_db, merged_user_data_db)
-    
-    # Step 3: Define the paths for the "DB" and "merged" directories
-    pasta_db = "DB"
-    num_arquivos_db = count_db(pasta_db)
-    pasta_mesclada = "merged"
-    os.makedirs(pasta_mesclada, exist_ok=True)
-
-    # Step 4: Merge various tables from the "DB" directory into the "merged" directory
-    merge_table_playlist_item(pasta_db, pasta_mesclada)
-    merge_table_tag(pasta_db, pasta_mesclada)
-    merge_table_tag_map(pasta_db, pasta_mesclada)
-    merge_table_independent_media(pasta_db, pasta_mesclada)
-    merge_table_playlist_item_marker(pasta_db, pasta_mesclada)
-    merge_table_playlist_item_marker_bible_verse_map(pasta_db, pasta_mesclada)
-    merge_table_playlist_item_location_map(pasta_db, pasta_mesclada)
-    merge_table_playlist_item_independent_media_map(pasta_db, pasta_mesclada)
-    merge_table_location(pasta_db, pasta_mesclada)
-
-    # Step 5: Update the "LastModified" column in the "LastModified" table
-    update_last_modified(pasta_mesclada)
-
-    # Step 6: Insert data into the "PlaylistItemAccuracy" table
-    insert_into_playlist_item_accuracy(pasta_mesclada)
-
-    # Step 7: Create or update the "manifest.json" file
-    create_update_manifest_file(pasta_mesclada)
-
-    # Step 8: Zip the "merged" folder to create the final ".jwlibrary" file
-    zip_merged_folder(pasta_mesclada)
-
-    # Step 9: Cleanup - remove the "DB" and "merged" directories after merging and zipping
-    shutil.rmtree("DB")
-    shutil.rmtree("merged")
+    main()
@@ -3,8 +3,15 @@ from setuptools import setup, find_packages
 setup(
     name='jw_library',
     version='0.1.0',
-    packages=find_packages(),
+    # sqlite3.Connection.serialize and deserialize are new in Python 3.11
+    python_requires='>=3.11',
+    packages=find_packages(exclude=['benchmarks']),
+    py_modules=['main'],
+    package_data={'src': ['userData.db', 'manifest.json']},
     entry_points={
-        'console_scripts': ['merge_jwlibrary=main:main'],
+        'console_scripts': [
+            'merge_jwlibrary=main:main',
+            'merge_jwlibrary_server=src.merge_server:main',
+        ],
     },
 )
@@ -0,0 +1,126 @@
+import os
+import csv
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .merger import Merger
+
+# Merger of the current worker process, created once by 'init_worker' and used for all its groups
+worker_merger = None
+
+
+def load_batch_manifest(manifest_path):
+    """
+    Read the merge groups of a batch manifest.
+
+    Parameters:
+        manifest_path (str): Path to a ".json" or ".csv" manifest.
+
+    Returns:
+        list: (output, inputs) tuples, one per group, in the order of the manifest. Relative paths are
+        resolved against the folder of the manifest, not the current directory.
+
+    Description:
+        A JSON manifest maps the name of every output archive to the list of its inputs:
+            {"group1.jwlibrary": ["a.jwlibrary", "b.jwlibrary"], "group2.jwlibrary": ["c.jwlibrary", "d.jwlibrary"]}
+        A CSV manifest has the output in the first column and one or more inputs in the next ones.
+        Rows with the same output add their inputs to the same group:
+            group1.jwlibrary,a.jwlibrary,b.jwlibrary
+            group2.jwlibrary,c.jwlibrary
+            group2.jwlibrary,d.jwlibrary
+
+    Example of use:
+        groups = load_batch_manifest("nightly.json")
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    groups = {}
+
+    if manifest_path.lower().endswith(".csv"):
+        with open(manifest_path, 'r', encoding='utf-8', newline='') as manifest_file:
+            for row in csv.reader(manifest_file):
+                row = [cell.strip() for cell in row if cell.strip()]
+                if not row or row[0].startswith("#"):
+                    continue
+                groups.setdefault(row[0], []).extend(row[1:])
+    else:
+        with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+            data = json.load(manifest_file)
+        if not isinstance(data, dict):
+            raise ValueError(f"'{manifest_path}' must map every output to the list of its inputs")
+        for output, inputs in data.items():
+            groups[output] = [inputs] if isinstance(inputs, str) else list(inputs)
+
+    return [
+        (os.path.join(base_dir, output), [os.path.join(base_dir, input_path) for input_path in inputs])
+        for output, inputs in groups.items()
+    ]
+
+
+def init_worker(attach):
+    """
+    Create the Merger of a worker process, so the template is loaded once per process.
+    """
+    global worker_merger
+    worker_merger = Merger(attach)
+
+
+def merge_group(output, inputs):
+    """
+    Merge one group with the Merger of the current process.
+
+    Returns:
+        dict: The output, the number of inputs, the status ("ok" or "failed"), the merge time and the error, if any.
+    """
+    start = time.perf_counter()
+    result = {"output": output, "inputs": len(inputs), "status": "ok"}
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        worker_merger.merge(inputs, output)
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def run_batch(groups, workers=None, attach=False):
+    """
+    Merge many independent groups of backups in one process pool.
+
+    Parameters:
+        groups (list): (output, inputs) tuples, as returned by 'load_batch_manifest'.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+            With a single worker, the groups are merged in the current process.
+        attach (bool, optional): Merge with ATTACH DATABASE and INSERT ... SELECT.
+
+    Returns:
+        int: The number of groups that failed. A group that fails does not stop the others; the result
+        of every group is printed.
+
+    Description:
+        Every worker process creates a single Merger, which keeps the template database and its merged
+        database connection for all the groups the process merges, so no process is launched and no
+        template is copied per group.
+
+    Example of use:
+        failed = run_batch(load_batch_manifest("nightly.json"), workers=4)
+    """
+    workers = min(workers or os.cpu_count() or 1, max(len(groups), 1))
+
+    if workers == 1:
+        init_worker(attach)
+        try:
+            results = [merge_group(output, inputs) for output, inputs in groups]
+        finally:
+            worker_merger.close()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(attach,)) as executor:
+            futures = [executor.submit(merge_group, output, inputs) for output, inputs in groups]
+            results = [future.result() for future in futures]
+
+    failed = [result for result in results if result["status"] != "ok"]
+    for result in failed:
+        print(f"Group '{result['output']}' failed: {result['error']}")
+    print(f"{len(results) - len(failed)} of {len(results)} groups merged successfully.")
+    return len(failed)
@@ -1,27 +1,19 @@
-import json
 import datetime
 import socket
-import os
 
-def create_update_manifest_file(merged_dir):
+def build_manifest_data(database_hash, schema_version):
     """
-    Create or update the "manifest.json" file with the provided data in the "merged" folder.
-
-    This function receives the path to the "merged" folder and performs the following:
-    - Creates a dictionary object containing the data for the "manifest.json" file.
-    - Retrieves the name of the device on which the code is being executed.
-    - Gets the current date and time in ISO format (UTC).
-    - Writes the dictionary content to the "manifest.json" file with indented formatting.
+    Build the content of the "manifest.json" file of the merged backup.
 
     Parameters:
-        merged_dir (str): Path to the "merged" folder where the "manifest.json" file will be created or updated.
+        database_hash (str): Hexadecimal SHA-256 of the merged "userData.db", as written to the archive.
+        schema_version (int): Schema version of the merged database, that is, its "PRAGMA user_version".
 
     Returns:
-        None. The function only creates or updates the "manifest.json" file in the "merged" folder.
+        dict: The data for the "manifest.json" file, with the name of the device on which the code is being
+        executed, the current date and time in ISO format, and the hash and schema version of the database.
+        JW Library checks them when the backup is restored.
     """
-    # Complete file path for the "manifest.json" file in the "merged" folder
-    file_path = os.path.join(merged_dir, "manifest.json")
-
     # Get the name of the device
     device_name = socket.gethostname()
 
@@ -29,7 +21,7 @@ def create_update_manifest_file(merged_dir):
     current_datetime = datetime.datetime.now().isoformat()
 
     # Data for the "manifest.json" file
-    manifest_data = {
+    return {
         "name": "Playlist_Merged.jwlibrary",
         "creationDate": current_datetime,
         "version": 1,
@@ -38,17 +30,7 @@ def create_update_manifest_file(merged_dir):
             "lastModifiedDate": current_datetime,
             "deviceName": device_name,
             "databaseName": "userData.db",
-            "hash": "f626f3f2f9622b80182aa5947b62d4fad296e7f9da56c599e177bc6d078c8eab",
-            "schemaVersion": 11
+            "hash": database_hash,
+            "schemaVersion": schema_version
         }
     }
-
-    try:
-        # Write the data to the "manifest.json" file with indented formatting
-        with open(file_path, 'w') as json_file:
-            json.dump(manifest_data, json_file, indent=4)
-
-        print("manifest.json file created and updated successfully!")
-
-    except Exception as e:
-        print(f"Error creating or updating the manifest.json file: {e}")
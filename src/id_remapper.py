@@ -0,0 +1,94 @@
+class IdRemapper:
+    """
+    Keep the in-memory old -> new ID maps used while merging the source databases.
+
+    Instead of rewriting the source databases every time an ID collides, the merge computes a
+    per-table offset once for each source (the current high-water mark of the key column in the
+    merged database) and shifts every ID of that source by it. The resulting old -> new pairs are
+    kept per source and per key column, so the foreign keys of the dependent tables can be
+    rewritten while their rows are copied into the merged database.
+
+    Rows that match an existing row of the merged database (for example, a Tag with the same
+    Type and Name) are not inserted again; their old ID is simply mapped to the existing one.
+
+    Every key column is only written by the merge of its own table, and only read by the tables of
+    later dependency levels, so the tables of one level can fill their maps from different threads.
+
+    Example of use:
+        remapper = IdRemapper()
+        offset = remapper.offset("userData(1).db", "PlaylistItemId", high_water)
+        remapper.map_id("userData(1).db", "PlaylistItemId", 12, 12 + offset)
+        remapper.remap("userData(1).db", "PlaylistItemId", 12)
+    """
+
+    def __init__(self):
+        # (source, column) -> offset applied to the IDs of that source
+        self.offsets = {}
+        # (source, column) -> {old_id: new_id}
+        self.maps = {}
+
+    def offset(self, source, column, high_water):
+        """
+        Return the offset applied to the IDs of 'column' in the given source.
+
+        The offset is the highest value of 'column' in the merged database once the sources before
+        this one are merged. It is fixed the first time it is asked for, so every ID of the source
+        is shifted by the same amount and can never collide with the rows merged before it.
+
+        Parameters:
+            source (str): Name of the source database being merged.
+            column (str): Name of the key column.
+            high_water (int): Highest value of 'column' in the merged database, including the rows
+                of the previous sources that are not written yet.
+
+        Returns:
+            int: The offset to add to every ID of the source.
+        """
+        key = (source, column)
+        if key not in self.offsets:
+            self.offsets[key] = high_water
+            self.maps.setdefault(key, {})
+        return self.offsets[key]
+
+    def map_id(self, source, column, old_id, new_id):
+        """
+        Record that 'old_id' of the given source is stored as 'new_id' in the merged database.
+
+        Parameters:
+            source (str): Name of the source database being merged.
+            column (str): Name of the key column.
+            old_id (int): ID in the source database.
+            new_id (int): ID in the merged database.
+        """
+        self.maps.setdefault((source, column), {})[old_id] = new_id
+
+    def remap(self, source, column, old_id):
+        """
+        Translate an ID of the given source into the ID used in the merged database.
+
+        Parameters:
+            source (str): Name of the source database being merged.
+            column (str): Name of the key column.
+            old_id (int or None): ID in the source database.
+
+        Returns:
+            int or None: The ID in the merged database, or None if 'old_id' is None or was never
+            merged (a dangling reference in the source database).
+        """
+        if old_id is None:
+            return None
+        return self.maps.get((source, column), {}).get(old_id)
+
+    def export(self, source):
+        """
+        Return the old -> new ID maps of a source in a form that can be saved as JSON.
+
+        Parameters:
+            source (str): Name of the source database that was merged.
+
+        Returns:
+            dict: {column: {old_id: new_id}} for every key column of the source. The old IDs are
+            converted to strings, since JSON objects only have string keys.
+        """
+        return {column: {str(old_id): new_id for old_id, new_id in id_map.items()}
+                for (map_source, column), id_map in self.maps.items() if map_source == source}
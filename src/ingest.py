@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from .load_user_data import deserialize_database
+
+# Compact result of the ingestion of a ".jwlibrary" file, ready to be merged:
+# - name: name of the source, used to key its ID maps during the merge.
+# - file_path: path to the ".jwlibrary" file, from which the media files are copied.
+# - data: normalized bytes of its "userData.db" (rollback journal, no WAL).
+SourceSnapshot = namedtuple("SourceSnapshot", ["name", "file_path", "data"])
+
+
+def ingest_archive(file_path, name=None):
+    """
+    Read, validate and normalize a ".jwlibrary" file.
+
+    Parameters:
+        file_path (str or file object): Path to the ".jwlibrary" file, or a seekable binary file object holding it.
+        name (str, optional): Name of the source. Defaults to the file name of 'file_path'.
+
+    Returns:
+        SourceSnapshot: The snapshot of the archive.
+
+    Raises:
+        ValueError: If the archive has no "userData.db" or the database is damaged.
+
+    Description:
+        The "userData.db" of the archive is loaded into memory, checked with "PRAGMA quick_check" and
+        serialized again, so the merge step receives a database that opens without a file on disk.
+        The function runs in a worker process, so it only takes and returns picklable values.
+
+    Example of use:
+        snapshot = ingest_archive("UserdataBackup.jwlibrary")
+    """
+    with zipfile.ZipFile(file_path, 'r') as zip_ref:
+        names = [os.path.basename(file_info.filename) for file_info in zip_ref.infolist()]
+        if "userData.db" not in names:
+            raise ValueError(f"'{file_path}' has no userData.db")
+        data = zip_ref.read("userData.db")
+
+    conn = deserialize_database(data)
+    try:
+        result = conn.execute("PRAGMA quick_check").fetchone()[0]
+        if result != "ok":
+            raise ValueError(f"userData.db of '{file_path}' is damaged: {result}")
+        data = conn.serialize()
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"userData.db of '{file_path}' is not a valid database: {e}")
+    finally:
+        conn.close()
+
+    return SourceSnapshot(name or os.path.basename(file_path), file_path, data)
+
+
+def ingest_archives(jwlibrary_files, workers=None):
+    """
+    Ingest all the ".jwlibrary" files in a pool of worker processes.
+
+    Parameters:
+        jwlibrary_files (list): Paths to the ".jwlibrary" files, in merge order.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+            With a single worker or a single file, the files are ingested in the current process.
+
+    Returns:
+        list: The SourceSnapshot of every valid archive, in the order of 'jwlibrary_files',
+        so the result of the merge does not depend on which worker finishes first.
+        Invalid archives are reported and left out.
+
+    Example of use:
+        snapshots = ingest_archives(["backup1.jwlibrary", "backup2.jwlibrary"])
+    """
+    workers = workers or os.cpu_count() or 1
+    snapshots = []
+
+    if workers == 1 or len(jwlibrary_files) == 1:
+        for file_path in jwlibrary_files:
+            try:
+                snapshots.append(ingest_archive(file_path))
+            except (ValueError, OSError, zipfile.BadZipFile) as e:
+                print(f"Skipping {file_path}: {e}")
+        return snapshots
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jwlibrary_files))) as executor:
+        futures = [executor.submit(ingest_archive, file_path) for file_path in jwlibrary_files]
+        for file_path, future in zip(jwlibrary_files, futures):
+            try:
+                snapshots.append(future.result())
+            except (ValueError, OSError, zipfile.BadZipFile) as e:
+                print(f"Skipping {file_path}: {e}")
+    return snapshots
+
+
+def open_snapshots(snapshots):
+    """
+    Open the databases of the ingested archives as in-memory connections.
+
+    Parameters:
+        snapshots (list): SourceSnapshot of every archive, in merge order.
+
+    Returns:
+        list: List of (name, sqlite3.Connection) tuples, as expected by the merge functions.
+
+    Description:
+        SQLite keeps its own copy of every database, so the bytes of each snapshot are released as soon as
+        its database is open: the entry of 'snapshots' is replaced by a copy without 'data'. Every source
+        is needed until the last table is merged, but the serialized bytes are never held beside it.
+    """
+    sources = []
+    for index, snapshot in enumerate(snapshots):
+        sources.append((snapshot.name, deserialize_database(snapshot.data)))
+        snapshots[index] = snapshot._replace(data=None)
+    return sources
@@ -0,0 +1,50 @@
+import sqlite3
+import os
+
+# Template database bundled with the program
+TEMPLATE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "userData.db")
+
+
+def deserialize_database(data, conn=None, name="main"):
+    """
+    Open the bytes of a SQLite database file as an in-memory database.
+
+    Parameters:
+        data (bytes): Content of the database file.
+        conn (sqlite3.Connection, optional): Connection to load the database into. A new in-memory
+            connection is created when it is not given; it can be read from other threads, so the
+            tables of a merge can be read in parallel.
+        name (str, optional): Name of the schema to load the database into, "main" or an attached schema.
+
+    Returns:
+        sqlite3.Connection: The connection holding the database.
+
+    Description:
+        JW Library saves "userData.db" in WAL mode, which an in-memory database cannot use.
+        The file format bytes of the header are switched back to the rollback journal
+        before the bytes are loaded, so SQLite can open the database without a file on disk.
+    """
+    if data[18:20] == b"\x02\x02":
+        data = bytearray(data)
+        data[18:20] = b"\x01\x01"
+
+    if conn is None:
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+    # SQLite copies the bytes, so the caller can release them once the database is open
+    conn.deserialize(data, name=name)
+    return conn
+
+
+def load_template_database():
+    """
+    Load the template "userData.db" bundled in the "src" folder into an in-memory database.
+
+    Returns:
+        sqlite3.Connection: In-memory connection holding an empty copy of the template database.
+
+    Description:
+        The template is read once per process by 'template_schema' and copied with the SQLite backup API.
+    """
+    # Imported here because the template schema is itself loaded with 'deserialize_database'
+    from .template_schema import template_schema
+    return template_schema().instantiate()
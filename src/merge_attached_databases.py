@@ -0,0 +1,312 @@
+import sqlite3
+
+from . import profiler
+from .load_user_data import deserialize_database
+from .table_descriptor import table_descriptors
+
+
+def map_columns(descriptors):
+    """
+    Return the columns whose old -> new values are kept in a temporary "map_<column>" table, with their type.
+
+    Parameters:
+        descriptors (list): TableDescriptor of every table.
+
+    Returns:
+        dict: Column -> SQL type, for the key column and the referenced columns of every merged table.
+    """
+    columns = {}
+    for descriptor in descriptors:
+        if descriptor.skip or descriptor.key_column is None:
+            continue
+        for column in [descriptor.key_column] + descriptor.referenced_columns:
+            columns[column] = descriptor.column_types[column] or "BLOB"
+    return columns
+
+
+def create_map_tables(merged_cursor, descriptors):
+    """
+    Create the temporary tables that hold the old -> new values of the source being merged.
+
+    Parameters:
+        merged_cursor (sqlite3.Cursor): Cursor of the merged database.
+        descriptors (list): TableDescriptor of every table.
+    """
+    for column, column_type in map_columns(descriptors).items():
+        merged_cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS map_{column} (old {column_type} PRIMARY KEY, new {column_type} NOT NULL)")
+    merged_cursor.execute("CREATE TEMP TABLE IF NOT EXISTS next_position (GroupId INTEGER PRIMARY KEY, NextPosition INTEGER NOT NULL)")
+
+
+def stage_statement(descriptor, source_columns):
+    """
+    Build the statement that copies a table of the source into "temp.stage", with its foreign keys already remapped.
+
+    Parameters:
+        descriptor (TableDescriptor): The table to be staged.
+        source_columns (set): Columns of the table in the source database.
+
+    Returns:
+        str: The CREATE TEMP TABLE ... AS SELECT statement. The stage has the columns of the template, plus
+        "_old" with the old key when the table has a key column. Rows whose parent was not merged are left out,
+        except for the optional references, which are set to NULL.
+    """
+    selected = [f"s.{descriptor.key_column} AS _old"] if descriptor.key_column else []
+    joins = []
+    conditions = []
+    for column in descriptor.columns:
+        if column not in source_columns:
+            selected.append(f"NULL AS {column}")
+        elif column in descriptor.foreign_keys:
+            alias = f"f{len(joins)}"
+            parent_column = descriptor.foreign_keys[column][1]
+            joins.append(f" LEFT JOIN temp.map_{parent_column} {alias} ON {alias}.old = s.{column}")
+            selected.append(f"{alias}.new AS {column}")
+            if column not in descriptor.optional_references:
+                conditions.append(f"(s.{column} IS NULL OR {alias}.new IS NOT NULL)")
+        else:
+            selected.append(f"s.{column} AS {column}")
+
+    statement = f"CREATE TEMP TABLE stage AS SELECT {', '.join(selected)} FROM source.{descriptor.name} s{''.join(joins)}"
+    if conditions:
+        statement += " WHERE " + " AND ".join(conditions)
+    return statement
+
+
+def match_statement(descriptor, key, nulls_match):
+    """
+    Build the statement that maps the staged rows matching a row of the merged database on a match key.
+    """
+    operator = "IS" if nulls_match else "="
+    match = " AND ".join(f"m.{column} {operator} st.{column}" for column in key)
+    return (f"INSERT OR IGNORE INTO temp.map_{descriptor.key_column} (old, new)"
+            f" SELECT st._old, m.{descriptor.key_column} FROM temp.stage st JOIN main.{descriptor.name} m ON {match}")
+
+
+def first_of_key_condition(descriptor, key, nulls_match, unmapped):
+    """
+    Build the condition that keeps only the first staged row of each value of a match key.
+
+    Rows of the same source can share a match key once their foreign keys are remapped, for example two
+    tag maps whose locations collapsed into one. The row engine maps the later ones to the first, so only
+    the first is inserted. The NULLs of the UNIQUE constraints never match, so those rows are always kept.
+    """
+    order_column = "_old" if descriptor.key_column else "rowid"
+    condition = (f"st.{order_column} IN (SELECT MIN({order_column}) FROM temp.stage"
+                 f"{' WHERE ' + unmapped if unmapped else ''} GROUP BY {', '.join(key)})")
+    if nulls_match:
+        return condition
+    # GROUP BY puts NULLs in the same group, so the rows with a NULL in the key are let through
+    return "(" + " OR ".join([f"st.{column} IS NULL" for column in key] + [condition]) + ")"
+
+
+def insert_statement(descriptor):
+    """
+    Build the statement that inserts the staged rows into the merged database.
+
+    The rows that match a row of the merged database on a match key, and all but the first staged row of
+    each match key, are left out, so the statement is a plain INSERT: any other constraint violation is an
+    error, as in the row engine. For the tables with a key column, the rows already mapped are left out and
+    the key is shifted by ":offset". The positions of the tables with a position rule are numbered after
+    the positions each group already has in the merged database.
+    """
+    columns = descriptor.column_list
+    if descriptor.key_column is None:
+        conditions = []
+        for key, nulls_match in descriptor.match_keys:
+            operator = "IS" if nulls_match else "="
+            match = " AND ".join(f"m.{column} {operator} st.{column}" for column in key)
+            conditions.append(f"NOT EXISTS (SELECT 1 FROM main.{descriptor.name} m WHERE {match})")
+            conditions.append(first_of_key_condition(descriptor, key, nulls_match, ""))
+        statement = f"INSERT INTO main.{descriptor.name} ({columns}) SELECT {columns} FROM temp.stage st"
+        if conditions:
+            statement += " WHERE " + " AND ".join(conditions)
+        return statement + " ORDER BY st.rowid"
+
+    selected = []
+    for column in descriptor.columns:
+        if column == descriptor.key_column:
+            selected.append("st._old + :offset")
+        elif descriptor.position and column == descriptor.position[1]:
+            group_column, position_column = descriptor.position
+            selected.append(f"COALESCE(np.NextPosition, 0) + ROW_NUMBER() OVER (PARTITION BY st.{group_column} ORDER BY st.{position_column}, st._old) - 1")
+        else:
+            selected.append(f"st.{column}")
+
+    unmapped = f"_old NOT IN (SELECT old FROM temp.map_{descriptor.key_column})"
+    statement = f"INSERT INTO main.{descriptor.name} ({columns}) SELECT {', '.join(selected)} FROM temp.stage st"
+    if descriptor.position:
+        statement += f" LEFT JOIN temp.next_position np ON np.GroupId = st.{descriptor.position[0]}"
+    statement += f" WHERE st.{unmapped}"
+    for key, nulls_match in descriptor.match_keys:
+        statement += " AND " + first_of_key_condition(descriptor, key, nulls_match, unmapped)
+    return statement + " ORDER BY st._old"
+
+
+def merge_attached_table(merged_cursor, descriptor, duplicates):
+    """
+    Copy a table of the source loaded into the "source" schema into the merged database.
+
+    Parameters:
+        merged_cursor (sqlite3.Cursor): Cursor of the merged database, with the source loaded into the "source" schema.
+        descriptor (TableDescriptor): The table to be merged.
+        duplicates (dict): Old key -> key in the merged database of the rows with the same fingerprint
+            as a row merged from another database.
+    """
+    table = descriptor.name
+    source_columns = {row[1] for row in merged_cursor.execute(f"PRAGMA source.table_info('{table}')").fetchall()}
+    if not source_columns:
+        return
+
+    merged_cursor.execute("DROP TABLE IF EXISTS temp.stage")
+    merged_cursor.execute(stage_statement(descriptor, source_columns))
+    rows_read = merged_cursor.execute(f"SELECT COUNT(*) FROM source.{table}").fetchone()[0]
+    rows_staged = merged_cursor.execute("SELECT COUNT(*) FROM temp.stage").fetchone()[0]
+
+    if descriptor.position:
+        group_column, position_column = descriptor.position
+        merged_cursor.execute("DELETE FROM temp.next_position")
+        merged_cursor.execute(f"INSERT INTO temp.next_position (GroupId, NextPosition)"
+                              f" SELECT {group_column}, MAX({position_column}) + 1 FROM main.{table} GROUP BY {group_column}")
+
+    if descriptor.key_column is None:
+        merged_cursor.execute(insert_statement(descriptor))
+        rows = merged_cursor.rowcount
+    else:
+        key_column = descriptor.key_column
+        offset = merged_cursor.execute(f"SELECT COALESCE(MAX({key_column}), 0) FROM main.{table}").fetchone()[0]
+
+        # Rows that already exist in the merged database are mapped to it and not copied
+        merged_cursor.executemany(f"INSERT OR IGNORE INTO temp.map_{key_column} (old, new) VALUES (?, ?)", duplicates.items())
+        for key, nulls_match in descriptor.match_keys:
+            merged_cursor.execute(match_statement(descriptor, key, nulls_match))
+
+        merged_cursor.execute(insert_statement(descriptor), {"offset": offset})
+        rows = merged_cursor.rowcount
+
+        # The inserted rows keep their shifted key, and the rows of the source that collapsed
+        # into one of them (same natural key) are mapped to it
+        merged_cursor.execute(f"INSERT OR IGNORE INTO temp.map_{key_column} (old, new)"
+                              f" SELECT st._old, m.{key_column} FROM temp.stage st JOIN main.{table} m ON m.{key_column} = st._old + :offset"
+                              f" WHERE st._old NOT IN (SELECT old FROM temp.map_{key_column})", {"offset": offset})
+        for key, nulls_match in descriptor.match_keys:
+            merged_cursor.execute(match_statement(descriptor, key, nulls_match))
+
+        for column in descriptor.referenced_columns:
+            merged_cursor.execute(f"INSERT OR IGNORE INTO temp.map_{column} (old, new)"
+                                  f" SELECT s.{column}, m.{column} FROM source.{table} s"
+                                  f" JOIN temp.map_{key_column} k ON k.old = s.{key_column}"
+                                  f" JOIN main.{table} m ON m.{key_column} = k.new")
+
+    merged_cursor.execute("DROP TABLE temp.stage")
+    collisions = rows_staged - rows
+    profiler.record(rows_read=rows_read, rows_written=rows, collisions=collisions)
+    print(f"'{table}' table: {rows} records merged, {collisions} already existed.")
+
+
+def merge_attached_database(merged_cursor, descriptors, duplicates=None):
+    """
+    Copy every table of the source loaded into the "source" schema into the merged database.
+
+    Each table is copied with INSERT ... SELECT statements generated from its TableDescriptor, so SQLite
+    moves the rows without creating Python objects for them. The foreign keys are rewritten by joining
+    with the temporary map tables filled by the parent tables, the rows that match a row of the merged
+    database on a UNIQUE constraint or a natural key are mapped to it, and the keys of the other rows are
+    shifted by the high-water mark of each table in the merged database.
+
+    Parameters:
+        merged_cursor (sqlite3.Cursor): Cursor of the merged database, with the source loaded into the "source" schema.
+        descriptors (list): TableDescriptor of every table, in merge order.
+        duplicates (dict, optional): Table -> {old key: merged key} of the rows with the same fingerprint as a row
+            already merged from another database, such as the playlist items exported from several devices.
+    """
+    duplicates = duplicates or {}
+    for column in map_columns(descriptors):
+        merged_cursor.execute(f"DELETE FROM temp.map_{column}")
+
+    for descriptor in descriptors:
+        if descriptor.skip:
+            continue
+        with profiler.stage(descriptor.name):
+            merge_attached_table(merged_cursor, descriptor, duplicates.get(descriptor.name, {}))
+
+
+def merge_attached_databases(sources, merged_conn, remapper=None):
+    """
+    Merge all the source databases into the merged database with INSERT ... SELECT statements run by SQLite.
+
+    For each source database, this function performs the following steps:
+    - Attaches an empty in-memory database to the merged connection as the "source" schema and copies the
+      source into it with 'serialize' and 'deserialize', so the sources opened from files and the ones
+      already in memory are read the same way, and the source connection is never written to.
+    - Copies every table described by 'table_descriptors' with INSERT ... SELECT, parents first, shifting
+      the keys by the offset of each table and rewriting the foreign keys through temporary map tables.
+    - Maps the rows that already exist in the merged database to the existing rows: tags, locations,
+      notes, user marks and every other row with the same UNIQUE or natural key, media with the same
+      content hash, and playlist items with the same content fingerprint, so an item exported from
+      several devices is merged once, together with its markers and maps.
+    - Commits the source in a single transaction and detaches it. SQLite cannot attach or detach a schema
+      inside a transaction, so every source is committed on its own.
+
+    Parameters:
+        sources (list): List of (name, sqlite3.Connection) tuples of the databases to be merged.
+        merged_conn (sqlite3.Connection): Connection to the merged database.
+        remapper (IdRemapper, optional): When given, receives the old -> new IDs of every source,
+            copied from the temporary map tables.
+
+    Returns:
+        None. The function only merges the records of all the databases.
+
+    Raises:
+        sqlite3.Error: If a source cannot be merged, such as a record that breaks a constraint of the
+            template. The transaction of that source is rolled back and the merge stops, as in the row
+            engine; the sources merged before it stay in the merged database, which the callers discard.
+
+    Example of use:
+        merge_attached_databases(sources, merged_conn)
+    """
+    descriptors = table_descriptors()
+    merged_cursor = merged_conn.cursor()
+    create_map_tables(merged_cursor, descriptors)
+    merged_conn.commit()
+
+    # Fingerprints of the rows already in the merged database, for the tables with a fingerprint rule
+    fingerprinted = [descriptor for descriptor in descriptors if descriptor.fingerprint and not descriptor.skip]
+    by_fingerprint = {descriptor.name: {fingerprint: key for key, fingerprint in descriptor.fingerprint(merged_conn).items()}
+                      for descriptor in fingerprinted}
+
+    for db_file, conn in sources:
+        print(f"Attaching file: {db_file}")
+
+        fingerprints = {descriptor.name: descriptor.fingerprint(conn) for descriptor in fingerprinted}
+        duplicates = {table: {key: by_fingerprint[table][fingerprint] for key, fingerprint in table_fingerprints.items()
+                              if fingerprint in by_fingerprint[table]}
+                      for table, table_fingerprints in fingerprints.items()}
+
+        merged_cursor.execute("ATTACH DATABASE ':memory:' AS source")
+        try:
+            deserialize_database(conn.serialize(), merged_conn, "source")
+            merge_attached_database(merged_cursor, descriptors, duplicates)
+            merged_conn.commit()
+
+            # Rows of the same database are never merged into each other by fingerprint, only into rows of other databases
+            for descriptor in fingerprinted:
+                table = descriptor.name
+                new_keys = dict(merged_cursor.execute(f"SELECT old, new FROM temp.map_{descriptor.key_column}").fetchall())
+                for key, fingerprint in fingerprints[table].items():
+                    if key not in duplicates[table] and key in new_keys:
+                        by_fingerprint[table].setdefault(fingerprint, new_keys[key])
+                print(f"{len(duplicates[table])} of {len(fingerprints[table])} '{table}' records were already merged from another database.")
+
+            if remapper is not None:
+                for column in map_columns(descriptors):
+                    for old_id, new_id in merged_cursor.execute(f"SELECT old, new FROM temp.map_{column}"):
+                        remapper.map_id(db_file, column, old_id, new_id)
+            print(f"{db_file} merged successfully!")
+        except sqlite3.Error:
+            # The transaction is rolled back before the source is detached, which SQLite refuses inside a transaction
+            merged_conn.rollback()
+            raise
+        finally:
+            merged_cursor.execute("DETACH DATABASE source")
+
+    merged_cursor.close()
@@ -0,0 +1,126 @@
+import os
+import json
+import hashlib
+import datetime
+
+JOURNAL_VERSION = 1
+
+
+def journal_path_for(zip_path):
+    """
+    Return the path of the merge journal kept next to a merged ".jwlibrary" file.
+
+    Example of use:
+        journal_path_for("merged_playlist.jwlibrary")  # "merged_playlist.journal.json"
+    """
+    base_name, _ = os.path.splitext(zip_path)
+    return f"{base_name}.journal.json"
+
+
+def file_sha256(file_path):
+    """
+    Compute the SHA-256 of a file, reading it in chunks.
+
+    Parameters:
+        file_path (str): Path to the file.
+
+    Returns:
+        str: The hexadecimal digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as source_file:
+        for chunk in iter(lambda: source_file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_journal(journal_path):
+    """
+    Load the merge journal of a merged ".jwlibrary" file.
+
+    Parameters:
+        journal_path (str): Path to the journal.
+
+    Returns:
+        dict or None: The journal, or None if it does not exist or was written by an unknown version.
+    """
+    if not os.path.exists(journal_path):
+        return None
+
+    with open(journal_path, 'r', encoding='utf-8') as journal_file:
+        journal = json.load(journal_file)
+
+    if journal.get("version") != JOURNAL_VERSION:
+        print(f"Unsupported merge journal version in '{journal_path}'. Ignoring it.")
+        return None
+    return journal
+
+
+def new_journal():
+    """
+    Return an empty merge journal.
+    """
+    return {"version": JOURNAL_VERSION, "sources": []}
+
+
+def merged_hashes(journal):
+    """
+    Return the SHA-256 of every backup already merged according to the journal.
+    """
+    return {source["sha256"] for source in journal["sources"]}
+
+
+def record_sources(journal, merged_files, remapper):
+    """
+    Add the backups of a merge to the journal.
+
+    Parameters:
+        journal (dict): Merge journal to be updated.
+        merged_files (list): (name, sha256) of every backup merged in this run, in merge order.
+        remapper (IdRemapper): ID maps used by the merge.
+
+    Description:
+        For each backup, the journal keeps its name, its SHA-256, the date of the merge and the
+        old -> new IDs that were given to its records in the merged database.
+    """
+    merged_at = datetime.datetime.now().isoformat()
+    for name, sha256 in merged_files:
+        journal["sources"].append({
+            "name": name,
+            "sha256": sha256,
+            "mergedAt": merged_at,
+            "idMaps": remapper.export(name),
+        })
+
+
+def discard_journal(zip_path):
+    """
+    Remove the merge journal of a merged ".jwlibrary" file that is about to be rewritten without it.
+
+    Parameters:
+        zip_path (str): Path to the merged ".jwlibrary" file.
+
+    Description:
+        The journal lists the backups the archive holds, and an incremental merge leaves them out. An archive
+        written by any other merge, such as the folder mode, a batch group or a merge of selected playlist
+        items, may no longer hold them, so its old journal is removed and the next incremental merge starts
+        from scratch instead of skipping backups the archive lacks.
+    """
+    journal_path = journal_path_for(zip_path)
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+        print(f"Removed '{journal_path}', since it no longer describes the merged archive.")
+
+
+def save_journal(journal, journal_path):
+    """
+    Write the merge journal, replacing the previous one only once it is complete.
+
+    Parameters:
+        journal (dict): Merge journal.
+        journal_path (str): Path to the journal.
+    """
+    temp_path = journal_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as journal_file:
+        json.dump(journal, journal_file, indent=4)
+    os.replace(temp_path, journal_path)
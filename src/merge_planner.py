@@ -0,0 +1,281 @@
+import os
+import copy
+import zlib
+import zipfile
+
+from .id_remapper import IdRemapper
+from .load_user_data import deserialize_database
+from .merge_table import read_merged_table, plan_table
+from .select_playlist_items import select_playlist_items
+from .table_descriptor import table_descriptors, merge_levels
+from .template_schema import template_schema
+
+# Bytes of the local header, central directory entry and data descriptor of a zip member, without its name
+ZIP_MEMBER_OVERHEAD = 30 + 46 + 16
+# Bytes of the end of central directory record of a zip archive
+ZIP_END_OVERHEAD = 22
+# Approximate size of the "manifest.json" of the merged archive
+MANIFEST_SIZE = 400
+# Number and size of the samples of a database deflated to estimate how much it shrinks in the archive
+SAMPLE_COUNT = 16
+SAMPLE_SIZE = 64 * 1024
+
+
+def key_descriptor(descriptor):
+    """
+    Return a copy of a TableDescriptor restricted to the columns that decide how its records are merged.
+
+    The copy keeps the key column, the foreign keys, the columns of the match keys, the referenced
+    columns and the position rule, so the plan does not copy the other columns, such as the content
+    of the notes, into its records. The fingerprint of a table is still computed from the databases,
+    so the plan of "PlaylistItem" reads the labels, trim offsets and markers of the playlist items.
+    """
+    needed = set(descriptor.foreign_keys) | set(descriptor.referenced_columns)
+    if descriptor.key_column:
+        needed.add(descriptor.key_column)
+    for key, _ in descriptor.match_keys:
+        needed.update(key)
+    if descriptor.position:
+        needed.update(descriptor.position)
+
+    restricted = copy.copy(descriptor)
+    restricted.columns = [column for column in descriptor.columns if column in needed]
+    return restricted
+
+
+def deflated_ratio(database):
+    """
+    Estimate the size of a database deflated into an archive, as a fraction of its size.
+
+    Parameters:
+        database (bytes): Content of the database.
+
+    Returns:
+        float: Deflated size of SAMPLE_COUNT samples spread over the database divided by their size.
+        The source archive may store its "userData.db" without compression, so its compressed size
+        says nothing of the size of the database in the merged archive, where it is always deflated.
+    """
+    if len(database) <= SAMPLE_COUNT * SAMPLE_SIZE:
+        samples = [database]
+    else:
+        step = len(database) // SAMPLE_COUNT
+        samples = [database[offset:offset + SAMPLE_SIZE] for offset in range(0, step * SAMPLE_COUNT, step)]
+    sampled = sum(len(sample) for sample in samples)
+    if not sampled:
+        return 1.0
+    return sum(len(zlib.compress(sample)) for sample in samples) / sampled
+
+
+def read_archive_directory(file_path):
+    """
+    Read the central directory of a ".jwlibrary" file and the bytes of its "userData.db".
+
+    Returns:
+        tuple: (members, database, database member). 'members' maps the file name of every other member
+        (media files and thumbnails) to its compressed size; 'database' holds the bytes of "userData.db".
+        No media file is decompressed.
+    """
+    with zipfile.ZipFile(file_path, 'r') as zip_ref:
+        members = {}
+        database_info = None
+        for file_info in zip_ref.infolist():
+            file_name = os.path.basename(file_info.filename)
+            if file_name == "userData.db":
+                database_info = file_info
+            elif file_name and not file_name.endswith(".db") and not file_name.endswith(".json"):
+                members.setdefault(file_name, file_info.compress_size)
+        if database_info is None:
+            raise ValueError(f"'{file_path}' has no userData.db")
+        database = zip_ref.read(database_info)
+    return members, database, database_info
+
+
+def plan_merge(jwlibrary_files, selection=None):
+    """
+    Estimate the result of a merge without merging or writing anything.
+
+    Parameters:
+        jwlibrary_files (list): Paths to the ".jwlibrary" files, in merge order.
+        selection (PlaylistSelection, optional): Plan the merge of only these playlist items and the records they need.
+
+    Returns:
+        dict: The plan of the merge:
+        - "sources": the name, number of records and size of the "userData.db" of every source.
+        - "tables": for every table, the records read, written, collided (mapped to an existing record),
+          left out (their parent is missing), remapped (given a new key) and pruned (no record refers to them).
+        - "media": the media files kept and their bytes, the media records collapsed into an identical copy, and
+          the files left out of the archive (duplicates or pruned) with the bytes that are not read.
+        - "estimated_output_bytes": the projected size of the merged archive.
+
+    Description:
+        Only the central directory of every archive and its "userData.db" are read; no media file is
+        decompressed. The tables are planned with the same 'plan_table' the merge uses, one dependency level
+        at a time, but on copies of the descriptors restricted to the key, foreign key and match key columns,
+        and against the empty template, so the collisions and remaps are the ones the merge would find.
+        The merged "userData.db" is estimated from the share of the records of every source that would be
+        written, deflated as much as samples of the source databases shrink, and the media files from the
+        compressed sizes listed in the central directories, since the in-memory merge copies them into the
+        merged archive without compressing them again.
+
+    Example of use:
+        plan = plan_merge(["backup1.jwlibrary", "backup2.jwlibrary"])
+        print_merge_plan(plan)
+    """
+    sources = []
+    archive_members = []
+    # Name -> (size of "userData.db", fraction of its size once deflated)
+    database_sizes = {}
+    for file_path in jwlibrary_files:
+        try:
+            members, database, database_info = read_archive_directory(file_path)
+        except (ValueError, OSError, zipfile.BadZipFile) as e:
+            print(f"Skipping {file_path}: {e}")
+            continue
+        name = os.path.basename(file_path)
+        sources.append((name, deserialize_database(database)))
+        archive_members.append(members)
+        database_sizes[name] = (database_info.file_size, deflated_ratio(database))
+
+    # Names of the files of every media record of the sources, to tell them from the other members
+    source_media = set()
+    for _, conn in sources:
+        source_media.update(file_path for (file_path,) in conn.execute("SELECT FilePath FROM IndependentMedia"))
+    if selection is not None:
+        select_playlist_items(sources, selection)
+
+    template = template_schema()
+    template_conn = template.instantiate()
+    remapper = IdRemapper()
+    descriptors = [key_descriptor(descriptor) for descriptor in table_descriptors()]
+
+    pruned_tables = {descriptor.name for descriptor in descriptors if descriptor.prune}
+
+    tables = {}
+    written_by_source = {name: 0 for name, _ in sources}
+    read_by_source = {name: 0 for name, _ in sources}
+    # Values of the pruned tables that other tables refer to, and identities of the records kept in them
+    reachable = {}
+    kept = {}
+
+    for level in merge_levels(descriptors):
+        for descriptor in level:
+            if descriptor.skip:
+                continue
+            stats = {"read": 0, "written": 0, "collisions": 0, "orphans": 0, "remapped": 0, "pruned": 0}
+            tables[descriptor.name] = stats
+            references = [(descriptor.columns.index(column), parent_column)
+                          for column, (parent, parent_column) in descriptor.foreign_keys.items()
+                          if parent != descriptor.name and parent in pruned_tables]
+            identity_columns = ([descriptor.key_column] if descriptor.key_column else []) + descriptor.referenced_columns
+            identity_positions = [descriptor.columns.index(column) for column in identity_columns]
+
+            merged_table = read_merged_table(descriptor, template_conn)
+            written = 0
+            for db_file, new_records, counts in plan_table(descriptor, sources, merged_table, remapper):
+                written += len(new_records)
+                for row in new_records:
+                    for position, parent_column in references:
+                        if row[position] is not None:
+                            reachable.setdefault(parent_column, set()).add(row[position])
+                    if descriptor.prune:
+                        kept.setdefault(descriptor.name, []).append(
+                            {column: row[position] for column, position in zip(identity_columns, identity_positions)})
+                if counts is None:
+                    continue
+                rows_read, dropped = counts
+                stats["read"] += rows_read
+                stats["written"] += written
+                stats["orphans"] += dropped
+                stats["collisions"] += rows_read - dropped - written
+                read_by_source[db_file] += rows_read
+                written_by_source[db_file] += written
+                written = 0
+
+            if descriptor.key_column:
+                for name, _ in sources:
+                    id_map = remapper.maps.get((name, descriptor.key_column), {})
+                    stats["remapped"] += sum(1 for old_id, new_id in id_map.items() if old_id != new_id)
+
+    # Records of the pruned tables that no kept record refers to
+    media_files = set()
+    for descriptor in descriptors:
+        if not descriptor.prune:
+            continue
+        for identity in kept.get(descriptor.name, []):
+            if not any(value in reachable.get(column, ()) for column, value in identity.items()):
+                tables[descriptor.name]["pruned"] += 1
+                tables[descriptor.name]["written"] -= 1
+            elif "FilePath" in identity:
+                media_files.add(identity["FilePath"])
+
+    # Media files: the kept ones are copied once, from the first archive that has them
+    media_bytes = 0
+    skipped_files = 0
+    skipped_bytes = 0
+    other_bytes = 0
+    seen = set()
+    for members in archive_members:
+        for file_name, compress_size in members.items():
+            if file_name in seen:
+                continue
+            seen.add(file_name)
+            if file_name in media_files:
+                media_bytes += compress_size + ZIP_MEMBER_OVERHEAD + 2 * len(file_name)
+            elif file_name not in source_media:
+                # Members that are not media records, such as "default_thumbnail.png"
+                other_bytes += compress_size + ZIP_MEMBER_OVERHEAD + 2 * len(file_name)
+            else:
+                # Collapsed into an identical copy or pruned, so never read
+                skipped_files += 1
+                skipped_bytes += compress_size
+
+    # The merged database keeps the share of the records of every source that is written
+    database_bytes = 0
+    compressed_database_bytes = 0
+    for name, _ in sources:
+        file_size, ratio = database_sizes[name]
+        share = written_by_source[name] / read_by_source[name] if read_by_source[name] else 0
+        database_bytes += file_size * share
+        compressed_database_bytes += file_size * share * ratio
+    template_bytes = len(template.conn.serialize())
+    database_bytes = int(max(database_bytes, template_bytes))
+    compressed_database_bytes = int(max(compressed_database_bytes, template_bytes * 0.1))
+
+    template_conn.close()
+    for _, conn in sources:
+        conn.close()
+
+    return {
+        "sources": [{"name": name, "records": read_by_source[name], "database_bytes": database_sizes[name][0]}
+                    for name, _ in sources],
+        "tables": tables,
+        "media": {
+            "files": len(media_files),
+            "bytes": media_bytes,
+            "duplicates": tables.get("IndependentMedia", {}).get("collisions", 0),
+            "skipped_files": skipped_files,
+            "skipped_bytes": skipped_bytes,
+        },
+        "database_bytes": database_bytes,
+        "estimated_output_bytes": (compressed_database_bytes + media_bytes + other_bytes + MANIFEST_SIZE
+                                   + 2 * (ZIP_MEMBER_OVERHEAD + len("userData.db")) + ZIP_END_OVERHEAD),
+    }
+
+
+def print_merge_plan(plan):
+    """
+    Print the plan of a merge, as returned by 'plan_merge', as a table.
+    """
+    for source in plan["sources"]:
+        print(f"{source['name']}: {source['records']} records, userData.db of {source['database_bytes']} bytes")
+
+    print(f"{'Table':<34}{'read':>10}{'written':>10}{'collisions':>12}{'orphans':>10}{'remapped':>10}{'pruned':>10}")
+    for table, stats in plan["tables"].items():
+        print(f"{table:<34}{stats['read']:>10}{stats['written']:>10}{stats['collisions']:>12}"
+              f"{stats['orphans']:>10}{stats['remapped']:>10}{stats['pruned']:>10}")
+
+    media = plan["media"]
+    print(f"Media: {media['files']} files ({media['bytes']} bytes) kept, {media['duplicates']} duplicate media records,"
+          f" {media['skipped_files']} files ({media['skipped_bytes']} bytes) left out.")
+    print(f"Estimated merged userData.db: {plan['database_bytes']} bytes.")
+    print(f"Estimated merged archive: {plan['estimated_output_bytes']} bytes.")
@@ -0,0 +1,317 @@
+"""
+Local HTTP service that merges uploaded ".jwlibrary" backups.
+
+Endpoints:
+    POST /merge   multipart/form-data with one file field per backup, in merge order. The merged archive is
+                  sent back as "application/octet-stream", with the job ID and its queue and merge times in
+                  the "X-Job-Id", "X-Queue-Seconds" and "X-Merge-Seconds" headers.
+    GET  /stats   JSON with the queue depth, the busy workers, the job counters and the latency of the last jobs.
+
+Example of use:
+    python -m src.merge_server --port 8765 --workers 2
+    curl -F "a=@backup1.jwlibrary" -F "b=@backup2.jwlibrary" http://127.0.0.1:8765/merge -o merged.jwlibrary
+"""
+import io
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .merger import Merger
+
+# Size of the chunks in which the merged archive is sent back
+CHUNK_SIZE = 1024 * 1024
+# Number of finished jobs kept for the latency statistics
+LATENCY_WINDOW = 1000
+
+
+class MergeJob:
+    """
+    A merge request waiting in the queue or being merged by a worker.
+
+    Parameters:
+        job_id (int): Sequential ID of the job.
+        uploads (list): Binary file objects of the backups, in merge order.
+    """
+
+    def __init__(self, job_id, uploads):
+        self.job_id = job_id
+        self.uploads = uploads
+        self.future = Future()
+        self.queued_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+
+    def timings(self):
+        """
+        Return the seconds the job waited in the queue and the seconds it took to merge.
+        """
+        return self.started_at - self.queued_at, self.finished_at - self.started_at
+
+
+class MergeService:
+    """
+    Fixed pool of worker threads that merge the queued jobs, each with its own Merger.
+
+    Parameters:
+        workers (int, optional): Number of worker threads, that is, of merges run at the same time.
+        queue_size (int, optional): Maximum number of jobs waiting for a worker. Further jobs are rejected.
+        attach (bool, optional): Merge with ATTACH DATABASE and INSERT ... SELECT.
+    """
+
+    def __init__(self, workers=2, queue_size=16, attach=False):
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.next_job_id = 1
+        self.active = 0
+        self.counters = {"accepted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.threads = [threading.Thread(target=self.work, args=(attach,), name=f"merge-worker-{index + 1}", daemon=True)
+                        for index in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, uploads):
+        """
+        Queue a merge job.
+
+        Parameters:
+            uploads (list): Binary file objects of the backups, in merge order.
+
+        Returns:
+            MergeJob: The queued job, or None when the queue is full.
+        """
+        with self.lock:
+            job = MergeJob(self.next_job_id, uploads)
+            self.next_job_id += 1
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            with self.lock:
+                self.counters["rejected"] += 1
+            return None
+        with self.lock:
+            self.counters["accepted"] += 1
+        return job
+
+    def work(self, attach):
+        """
+        Merge the queued jobs until the service is stopped.
+        """
+        with Merger(attach) as merger:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    return
+                with self.lock:
+                    self.active += 1
+                job.started_at = time.perf_counter()
+                try:
+                    data = merger.merge(job.uploads)
+                except Exception as e:
+                    job.finished_at = time.perf_counter()
+                    job.future.set_exception(e)
+                    status = "failed"
+                else:
+                    job.finished_at = time.perf_counter()
+                    job.future.set_result(data)
+                    status = "completed"
+
+                queue_seconds, merge_seconds = job.timings()
+                with self.lock:
+                    self.active -= 1
+                    self.counters[status] += 1
+                    self.latencies.append({
+                        "job": job.job_id,
+                        "status": status,
+                        "sources": len(job.uploads),
+                        "queue_seconds": round(queue_seconds, 6),
+                        "merge_seconds": round(merge_seconds, 6),
+                    })
+
+    def stats(self):
+        """
+        Return the state of the queue and the latency of the last jobs.
+
+        Returns:
+            dict: Queue depth, busy and total workers, job counters, and the mean, median, 95th percentile and
+            maximum of the total time (queue + merge) of the last LATENCY_WINDOW jobs, with the last jobs themselves.
+        """
+        with self.lock:
+            latencies = list(self.latencies)
+            stats = {
+                "queue_depth": self.jobs.qsize(),
+                "queue_size": self.jobs.maxsize,
+                "workers": len(self.threads),
+                "active": self.active,
+                **self.counters,
+            }
+
+        totals = sorted(job["queue_seconds"] + job["merge_seconds"] for job in latencies)
+        if totals:
+            stats["latency_seconds"] = {
+                "mean": round(sum(totals) / len(totals), 6),
+                "p50": round(totals[len(totals) // 2], 6),
+                "p95": round(totals[min(len(totals) - 1, int(len(totals) * 0.95))], 6),
+                "max": round(totals[-1], 6),
+            }
+        stats["recent_jobs"] = latencies[-20:]
+        return stats
+
+    def stop(self):
+        """
+        Stop the workers once the queued jobs are merged.
+        """
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+
+
+def parse_uploads(content_type, body):
+    """
+    Read the files of a multipart/form-data request body.
+
+    Parameters:
+        content_type (str): The "Content-Type" header of the request, with its boundary.
+        body (bytes): The request body.
+
+    Returns:
+        list: A binary file object for every file field, in the order of the body. Fields without a file name are ignored.
+    """
+    message = BytesParser(policy=HTTP).parsebytes(b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+    uploads = []
+    if not message.is_multipart():
+        return uploads
+    for part in message.iter_parts():
+        file_name = part.get_filename()
+        if not file_name:
+            continue
+        upload = io.BytesIO(part.get_payload(decode=True) or b"")
+        upload.name = file_name
+        uploads.append(upload)
+    return uploads
+
+
+class MergeRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handle the requests of the merge service. The service and the upload limit are set on the server.
+    """
+
+    def send_json(self, status, data):
+        body = json.dumps(data, indent=4).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/stats":
+            self.send_json(404, {"error": "not found"})
+            return
+        self.send_json(200, self.server.service.stats())
+
+    def do_POST(self):
+        if self.path != "/merge":
+            self.send_json(404, {"error": "not found"})
+            return
+
+        content_type = self.headers.get("Content-Type", "")
+        length = int(self.headers.get("Content-Length") or 0)
+        if not content_type.startswith("multipart/form-data"):
+            self.send_json(400, {"error": "expected multipart/form-data"})
+            return
+        if length > self.server.max_upload_size:
+            self.send_json(413, {"error": f"upload larger than {self.server.max_upload_size} bytes"})
+            return
+
+        uploads = parse_uploads(content_type, self.rfile.read(length))
+        if not uploads:
+            self.send_json(400, {"error": "no .jwlibrary file in the request"})
+            return
+
+        job = self.server.service.submit(uploads)
+        if job is None:
+            self.send_json(503, {"error": "merge queue is full, try again later"})
+            return
+
+        try:
+            data = job.future.result()
+        except ValueError as e:
+            self.send_json(422, {"error": str(e), "job": job.job_id})
+            return
+        except Exception as e:
+            self.send_json(500, {"error": str(e), "job": job.job_id})
+            return
+
+        queue_seconds, merge_seconds = job.timings()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Disposition", 'attachment; filename="merged_playlist.jwlibrary"')
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("X-Job-Id", str(job.job_id))
+        self.send_header("X-Queue-Seconds", f"{queue_seconds:.6f}")
+        self.send_header("X-Merge-Seconds", f"{merge_seconds:.6f}")
+        self.end_headers()
+
+        view = memoryview(data)
+        for start in range(0, len(view), CHUNK_SIZE):
+            self.wfile.write(view[start:start + CHUNK_SIZE])
+
+
+def create_server(host="127.0.0.1", port=8765, workers=2, queue_size=16, attach=False, max_upload_size=512 * 1024 * 1024):
+    """
+    Create the HTTP server of the merge service, with its worker pool already running.
+
+    Parameters:
+        host (str, optional): Address to listen on. Defaults to localhost only.
+        port (int, optional): Port to listen on. Use 0 to pick a free port.
+        workers (int, optional): Number of merges run at the same time.
+        queue_size (int, optional): Maximum number of jobs waiting for a worker.
+        attach (bool, optional): Merge with ATTACH DATABASE and INSERT ... SELECT.
+        max_upload_size (int, optional): Largest request body accepted, in bytes.
+
+    Returns:
+        ThreadingHTTPServer: The server. Call 'serve_forever' to handle requests, then 'shutdown',
+        'server_close' and 'service.stop' to stop it.
+
+    Example of use:
+        server = create_server(port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(server.server_address)
+    """
+    server = ThreadingHTTPServer((host, port), MergeRequestHandler)
+    server.service = MergeService(workers, queue_size, attach)
+    server.max_upload_size = max_upload_size
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve .jwlibrary merges over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on (default: 8765)")
+    parser.add_argument("--workers", type=int, default=2, help="number of merges run at the same time (default: 2)")
+    parser.add_argument("--queue-size", type=int, default=16, help="maximum number of jobs waiting for a worker (default: 16)")
+    parser.add_argument("--attach", action="store_true", help="merge with ATTACH DATABASE and INSERT ... SELECT")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.workers, args.queue_size, args.attach)
+    print(f"Merge service listening on http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.stop()
+
+
+if __name__ == "__main__":
+    main()
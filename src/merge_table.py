@@ -0,0 +1,371 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import profiler
+from .table_descriptor import table_descriptors, merge_levels
+
+# Number of records read from a source with 'fetchmany' and inserted with 'executemany' at a time
+CHUNK_SIZE = 2000
+# Number of chunks a table planned in a thread can get ahead of the writer of the merged database
+QUEUE_SIZE = 4
+
+
+def source_select(descriptor, conn, order_by=None):
+    """
+    Build the SELECT that reads a table of a source database with the columns of the template.
+
+    Parameters:
+        descriptor (TableDescriptor): The table to be read.
+        conn (sqlite3.Connection): Connection to the source database.
+        order_by (str, optional): ORDER BY clause of the query.
+
+    Returns:
+        str or None: The query, with NULL in place of the columns the source does not have,
+        or None when the source has no such table.
+    """
+    source_columns = {row[1] for row in conn.execute(f"PRAGMA table_info('{descriptor.name}')")}
+    if not source_columns:
+        return None
+    columns = ", ".join(column if column in source_columns else "NULL" for column in descriptor.columns)
+    query = f"SELECT {columns} FROM {descriptor.name}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    return query
+
+
+def iter_chunks(cursor, chunk_size=CHUNK_SIZE):
+    """
+    Yield the rows of an executed query in lists of at most 'chunk_size' rows, so a table is never loaded at once.
+    """
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+def match_positions(descriptor):
+    """
+    Return the positions of the columns used to match and map the records of a table.
+
+    Returns:
+        tuple: (match_keys, identity_positions). 'match_keys' has the positions and nulls_match flag of every
+        match key of the descriptor. 'identity_positions' are the positions of the key column and of the
+        referenced columns, the only values of a merged record the merge needs to keep.
+    """
+    positions = {column: position for position, column in enumerate(descriptor.columns)}
+    match_keys = [(tuple(positions[column] for column in key), nulls_match) for key, nulls_match in descriptor.match_keys]
+    identity_columns = ([descriptor.key_column] if descriptor.key_column else []) + descriptor.referenced_columns
+    return match_keys, [positions[column] for column in identity_columns]
+
+
+def index_row(match_keys, indexes, row, identity):
+    """
+    Add a record of the merged database to the indexes of its match keys.
+
+    Only the identity of the record (its key and referenced values) is kept, not the whole record,
+    so large columns such as the content of the notes are not held in memory.
+    """
+    for (positions, nulls_match), index in zip(match_keys, indexes):
+        key = tuple(row[position] for position in positions)
+        if nulls_match or None not in key:
+            index.setdefault(key, identity)
+
+
+def read_merged_table(descriptor, merged_conn):
+    """
+    Read what the merge of a table needs to know about the records already in the merged database.
+
+    Parameters:
+        descriptor (TableDescriptor): The table to be merged.
+        merged_conn (sqlite3.Connection): Connection to the merged database.
+
+    Returns:
+        dict: The identities of the merged records by every match key ("indexes") and by fingerprint
+        ("by_fingerprint"), the next position of every group ("next_positions") and the highest value of
+        the key column ("high_water"). The merge of the table updates it as the sources are merged.
+    """
+    match_keys, identity_positions = match_positions(descriptor)
+    key_position = identity_positions[0] if descriptor.key_column else None
+    merged_fingerprints = descriptor.fingerprint(merged_conn) if descriptor.fingerprint else {}
+
+    merged_cursor = merged_conn.cursor()
+
+    # Index the records already in the merged database by every match key, once for all the sources
+    indexes = [{} for _ in match_keys]
+    by_fingerprint = {}
+    high_water = 0
+    merged_cursor.execute(f"SELECT {', '.join(descriptor.columns)} FROM {descriptor.name}")
+    for rows in iter_chunks(merged_cursor):
+        for row in rows:
+            identity = tuple(row[position] for position in identity_positions)
+            index_row(match_keys, indexes, row, identity)
+            if key_position is not None:
+                high_water = max(high_water, row[key_position])
+                fingerprint = merged_fingerprints.get(row[key_position])
+                if fingerprint is not None:
+                    by_fingerprint.setdefault(fingerprint, identity)
+
+    next_positions = {}
+    if descriptor.position:
+        group_column, position_column = descriptor.position
+        merged_cursor.execute(f"SELECT {group_column}, MAX({position_column}) + 1 FROM {descriptor.name} GROUP BY {group_column}")
+        next_positions = dict(merged_cursor)
+
+    merged_cursor.close()
+    return {"indexes": indexes, "by_fingerprint": by_fingerprint, "next_positions": next_positions, "high_water": high_water}
+
+
+def plan_table(descriptor, sources, merged_table, remapper):
+    """
+    Work out, chunk by chunk, the records of a table that every source database adds to the merged database.
+
+    For each source database, this generator performs the following steps:
+    - Reads the records of the table with 'fetchmany', CHUNK_SIZE records at a time.
+    - Rewrites every foreign key with the new ID (or value) recorded in the remapper by the parent table. Records
+      whose parent was not merged are left out, except for the optional references, which are set to NULL.
+    - Looks each record up in an index of the merged records by every match key of the table: its UNIQUE
+      constraints and the natural keys of TABLE_RULES. A record that matches is not inserted again, and its
+      key is mapped to the existing record. Records with the same fingerprint as a record merged from another
+      database are mapped the same way.
+    - Shifts the key column of the other records by the offset of the current database and renumbers their
+      positions when the table has a position rule.
+    - Records the old -> new key, and the old -> new value of the columns other tables refer to, in the remapper.
+    - Yields the new records of the chunk, so they are inserted before the next chunk is read.
+
+    The merged database is not touched, so the tables of a dependency level can be planned in parallel
+    threads: each reads the source databases and the maps of its parent tables, which are final, and
+    only writes the maps of its own columns. Only one chunk of records is held at a time; what grows
+    with the size of the table is the identity (key and referenced values) kept for every match key.
+
+    Parameters:
+        descriptor (TableDescriptor): The table to be merged.
+        sources (list): List of (name, sqlite3.Connection) tuples of the databases to be merged.
+        merged_table (dict): What the merged database holds, as returned by 'read_merged_table'.
+        remapper (IdRemapper): Shared old -> new ID maps of the merge.
+
+    Yields:
+        tuple: (name, new records, counts) for every chunk of every source that has the table, in the order of
+        'sources'. 'counts' is None, except in the last chunk of a source, where it is (records read, records left out).
+    """
+    columns = descriptor.columns
+    positions = {column: position for position, column in enumerate(columns)}
+    key_position = positions.get(descriptor.key_column)
+    foreign_keys = [(positions[column], parent_column, column in descriptor.optional_references)
+                    for column, (_, parent_column) in descriptor.foreign_keys.items()]
+    match_keys, identity_positions = match_positions(descriptor)
+    # Position in the identity of every column mapped in the remapper
+    mapped = [(position, column, index) for index, (position, column) in enumerate(
+        zip(identity_positions, ([descriptor.key_column] if descriptor.key_column else []) + descriptor.referenced_columns))]
+
+    indexes = merged_table["indexes"]
+    by_fingerprint = merged_table["by_fingerprint"]
+    next_positions = merged_table["next_positions"]
+
+    order_by = None
+    if descriptor.position:
+        group_column, position_column = descriptor.position
+        group_position, position_position = positions[group_column], positions[position_column]
+        order_by = f"{group_column}, {position_column}"
+
+    for db_file, conn in sources:
+        query = source_select(descriptor, conn, order_by)
+        if query is None:
+            continue
+
+        offset = 0
+        if descriptor.key_column:
+            offset = remapper.offset(db_file, descriptor.key_column, merged_table["high_water"])
+
+        fingerprints = descriptor.fingerprint(conn) if descriptor.fingerprint else {}
+        new_fingerprints = {}
+
+        rows_read = 0
+        dropped = 0
+        source_cursor = conn.cursor()
+        source_cursor.execute(query)
+        for records in iter_chunks(source_cursor):
+            rows_read += len(records)
+            new_records = []
+            for record in records:
+                row = list(record)
+
+                # Rewrite the foreign keys with the new IDs of the parent records
+                orphan = False
+                for position, parent_column, optional in foreign_keys:
+                    if row[position] is None:
+                        continue
+                    new_value = remapper.remap(db_file, parent_column, row[position])
+                    if new_value is None and not optional:
+                        orphan = True
+                        break
+                    row[position] = new_value
+                if orphan:
+                    dropped += 1
+                    continue
+
+                # Look the record up in the merged records, by fingerprint and by every match key
+                existing = None
+                fingerprint = fingerprints.get(record[key_position]) if fingerprints else None
+                if fingerprint is not None:
+                    existing = by_fingerprint.get(fingerprint)
+                if existing is None:
+                    for (key_positions, nulls_match), index in zip(match_keys, indexes):
+                        key = tuple(row[position] for position in key_positions)
+                        if (nulls_match or None not in key) and key in index:
+                            existing = index[key]
+                            break
+
+                if existing is None:
+                    if key_position is not None:
+                        row[key_position] = record[key_position] + offset
+                        merged_table["high_water"] = max(merged_table["high_water"], row[key_position])
+                    if descriptor.position:
+                        group = row[group_position]
+                        row[position_position] = next_positions.get(group, 0)
+                        next_positions[group] = row[position_position] + 1
+                    existing = tuple(row[position] for position in identity_positions)
+                    new_records.append(row)
+                    index_row(match_keys, indexes, row, existing)
+                    if fingerprint is not None:
+                        new_fingerprints.setdefault(fingerprint, existing)
+
+                # Record the old -> new key and referenced values, for the tables that refer to this one
+                for position, column, index in mapped:
+                    remapper.map_id(db_file, column, record[position], existing[index])
+
+            yield db_file, new_records, None
+        source_cursor.close()
+
+        # Records of the same database are never merged into each other by fingerprint, only into records of other databases
+        for fingerprint, identity in new_fingerprints.items():
+            by_fingerprint.setdefault(fingerprint, identity)
+
+        yield db_file, [], (rows_read, dropped)
+
+
+def produce(batches, batch_queue, cancelled):
+    """
+    Put the chunks of a plan in a bounded queue, from a worker thread, followed by None once the plan is done.
+
+    An error is put in the queue to be raised by 'consume'. The thread stops when 'cancelled' is set,
+    so a writer that fails does not leave it blocked on a full queue.
+    """
+    try:
+        for item in batches:
+            while not cancelled.is_set():
+                try:
+                    batch_queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if cancelled.is_set():
+                return
+        item = None
+    except Exception as e:
+        item = e
+    while not cancelled.is_set():
+        try:
+            batch_queue.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def consume(batch_queue):
+    """
+    Yield the chunks put in the queue by 'produce', until the plan is done.
+    """
+    while True:
+        item = batch_queue.get()
+        if item is None:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def write_table(descriptor, batches, merged_conn):
+    """
+    Insert the new records of a table as they are planned by 'plan_table', one chunk at a time.
+
+    Parameters:
+        descriptor (TableDescriptor): The table being merged.
+        batches (iterable): (name, new records, counts) chunks, as yielded by 'plan_table'.
+        merged_conn (sqlite3.Connection): Connection to the merged database. The caller commits the merge.
+    """
+    table = descriptor.name
+    merged_cursor = merged_conn.cursor()
+    written = 0
+    for db_file, new_records, counts in batches:
+        merged_cursor.executemany(descriptor.insert_sql, new_records)
+        written += len(new_records)
+        if counts is None:
+            continue
+
+        rows_read, dropped = counts
+        collisions = rows_read - dropped - written
+        profiler.record(rows_read=rows_read, rows_written=written, collisions=collisions)
+        if rows_read:
+            print(f"'{table}' table of {db_file}: {written} records merged, {collisions} already existed.")
+        written = 0
+    merged_cursor.close()
+
+
+def merge_tables(sources, merged_conn, remapper, workers=None):
+    """
+    Merge every table of the template schema from all the source databases, one dependency level at a time.
+
+    Parameters:
+        sources (list): List of (name, sqlite3.Connection) tuples of the databases to be merged. The
+            connections must allow being used from other threads when 'workers' is not 1.
+        merged_conn (sqlite3.Connection): Connection to the merged database. The caller commits the merge.
+        remapper (IdRemapper): Shared old -> new ID maps of the merge.
+        workers (int, optional): Number of threads that plan the tables of a level at the same time.
+            Defaults to 1, which merges the tables one at a time in the current thread: the planning is
+            bound by the GIL, so the threads measured slower than the serial merge on the benchmarks.
+            They are kept as an option for sources whose reads wait on the disk.
+
+    Description:
+        The levels come from the foreign keys of the schema ('merge_levels'): the tables of a level only
+        refer to the tables of the previous levels, whose ID maps are final by the time the level starts.
+        Every table is merged as a pipeline of chunks: read from the source, remapped, and inserted
+        into the merged database before the next chunk is read. The tables of a level are planned in
+        parallel threads, each handing its chunks to the main thread through a queue of QUEUE_SIZE
+        chunks, and the main thread writes them to the merged database in the order of the level.
+
+    Example of use:
+        merge_tables(sources, merged_conn, IdRemapper())
+    """
+    levels = [[descriptor for descriptor in level if not descriptor.skip] for level in merge_levels(table_descriptors())]
+    workers = min(workers or 1, max(len(level) for level in levels))
+
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    cancelled = threading.Event()
+    try:
+        for level in levels:
+            merged_tables = {}
+            for descriptor in level:
+                with profiler.stage(descriptor.name):
+                    merged_tables[descriptor.name] = read_merged_table(descriptor, merged_conn)
+
+            if executor is None:
+                for descriptor in level:
+                    with profiler.stage(descriptor.name):
+                        write_table(descriptor, plan_table(descriptor, sources, merged_tables[descriptor.name], remapper), merged_conn)
+                continue
+
+            batch_queues = []
+            for descriptor in level:
+                batch_queue = queue.Queue(maxsize=QUEUE_SIZE)
+                executor.submit(produce, plan_table(descriptor, sources, merged_tables[descriptor.name], remapper), batch_queue, cancelled)
+                batch_queues.append((descriptor, batch_queue))
+            for descriptor, batch_queue in batch_queues:
+                # The wall time of a table includes the wait for its chunks, while the other tables are planned
+                with profiler.stage(descriptor.name):
+                    write_table(descriptor, consume(batch_queue), merged_conn)
+    finally:
+        if executor is not None:
+            cancelled.set()
+            executor.shutdown()
@@ -0,0 +1,250 @@
+import io
+import os
+import sqlite3
+import zipfile
+
+from .id_remapper import IdRemapper
+from .merge_table import merge_tables
+from .merge_attached_databases import merge_attached_databases
+from .prune_unreachable import prune_unreachable
+from .select_playlist_items import select_playlist_items
+from .merge_table_last_modified import update_last_modified
+from .insert_into_playlist_item_accuracy import insert_into_playlist_item_accuracy
+from .load_user_data import TEMPLATE_DB_PATH, deserialize_database
+from .template_schema import template_schema
+from .ingest import ingest_archive, ingest_archives, open_snapshots
+from .write_merged_archive import write_merged_archive
+from .merge_journal import discard_journal
+from .profiler import stage, record
+
+
+def find_skipped_media_files(sources, merged_conn, removed_files=()):
+    """
+    List the media files of the source databases that the merged database does not refer to.
+
+    Parameters:
+        sources (list): List of (name, sqlite3.Connection) tuples of the merged databases.
+        merged_conn (sqlite3.Connection): Connection to the merged database.
+        removed_files (set, optional): Media files of the records removed from the sources before the merge,
+            such as the ones of the playlist items that were not selected.
+
+    Returns:
+        set: Names of the media files referenced by a source "IndependentMedia" table that are not
+        referenced by the merged one, because they were collapsed into an identical copy or pruned as
+        unreachable. They must not be read from the sources nor written to the merged archive.
+
+    Example of use:
+        skipped_files = find_skipped_media_files(sources, merged_conn)
+    """
+    source_files = set(removed_files)
+    for _, conn in sources:
+        source_files.update(file_path for (file_path,) in conn.execute("SELECT FilePath FROM IndependentMedia"))
+
+    merged_files = {file_path for (file_path,) in merged_conn.execute("SELECT FilePath FROM IndependentMedia")}
+    return source_files - merged_files
+
+
+def merge_sources(sources, merged_conn, attach=False, remapper=None, workers=None, selection=None):
+    """
+    Merge the tables of all the source databases into the merged database and commit the result.
+
+    Parameters:
+        sources (list): List of (name, sqlite3.Connection) tuples of the databases to be merged.
+        merged_conn (sqlite3.Connection): Connection to the merged database.
+        attach (bool, optional): Merge with ATTACH DATABASE and INSERT ... SELECT instead of copying the records one by one.
+        remapper (IdRemapper, optional): Receives the old -> new IDs given to the records of every source.
+        workers (int, optional): Number of threads that merge the independent tables of a dependency level at
+            the same time. Defaults to 1, which merges them one at a time.
+            The ATTACH engine runs every statement on the merged connection, so it always merges one table at a time.
+        selection (PlaylistSelection, optional): Merge only these playlist items and the records they need,
+            instead of every record. The source databases are changed, so they must be copies.
+
+    Returns:
+        set: Names of the media files collapsed into an identical copy or no longer referred to, which are left out of the merged archive.
+    """
+    try:
+        removed_files = set()
+        if selection is not None:
+            with stage("select"):
+                removed_files = select_playlist_items(sources, selection)
+
+        # The triggers of the template update "LastModified" once per inserted or removed record, so they are
+        # dropped for the merge and the prune, and created again before "LastModified" is set once
+        triggers = merged_conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall()
+        for name, _ in triggers:
+            merged_conn.execute(f"DROP TRIGGER {name}")
+
+        if attach:
+            merge_attached_databases(sources, merged_conn, remapper)
+        else:
+            # All the tables are merged in a single transaction, committed once at the end
+            remapper = remapper if remapper is not None else IdRemapper()
+            merge_tables(sources, merged_conn, remapper, workers)
+
+        # Remove the locations and media no record refers to, then update the "LastModified" column
+        # and insert data into the "PlaylistItemAccuracy" table
+        with stage("prune"):
+            prune_unreachable(merged_conn)
+        for _, sql in triggers:
+            merged_conn.execute(sql)
+        with stage("LastModified"):
+            update_last_modified(merged_conn)
+        with stage("seed PlaylistItemAccuracy"):
+            insert_into_playlist_item_accuracy(merged_conn)
+        with stage("commit"):
+            merged_conn.commit()
+        return find_skipped_media_files(sources, merged_conn, removed_files)
+    except sqlite3.Error:
+        merged_conn.rollback()
+        raise
+    finally:
+        for _, conn in sources:
+            conn.close()
+
+
+class Merger:
+    """
+    Merge ".jwlibrary" backups into a single archive, without depending on the current directory.
+
+    The template database is captured once per process by 'template_schema', and the merged database is
+    kept in a single in-memory connection that is reset from the template with the SQLite backup API
+    before each merge, so the statements prepared by
+    SQLite for that connection are reused from one merge to the next. A long-running process can
+    create one Merger and call 'merge' many times. A Merger is not thread-safe: use one per thread
+    or process.
+
+    Parameters:
+        attach (bool, optional): Merge with ATTACH DATABASE and INSERT ... SELECT instead of copying the records one by one.
+        workers (int, optional): Number of processes that read the backups given as paths, and of threads that
+            merge the independent tables of the backups. Defaults to 1, which does both in the current thread and
+            suits many small merges; None uses one per CPU.
+        template_path (str, optional): Path to the template "userData.db". Defaults to the one bundled in "src".
+        selection (PlaylistSelection, optional): Merge only these playlist items and the records they need.
+
+    Example of use:
+        with Merger() as merger:
+            merger.merge(["backup1.jwlibrary", "backup2.jwlibrary"], "merged.jwlibrary")
+            data = merger.merge([open("backup3.jwlibrary", "rb"), io.BytesIO(upload)])
+    """
+
+    def __init__(self, attach=False, workers=1, template_path=TEMPLATE_DB_PATH, selection=None):
+        self.attach = attach
+        self.workers = workers
+        self.selection = selection
+        self.template = template_schema(template_path)
+        self.merged_conn = sqlite3.connect(":memory:")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Close the merged database connection.
+        """
+        self.merged_conn.close()
+
+    def ingest(self, inputs):
+        """
+        Read and validate the backups to be merged.
+
+        Parameters:
+            inputs (list): Paths to ".jwlibrary" files or binary file objects holding them, in merge order.
+
+        Returns:
+            list: The SourceSnapshot of every valid backup, in the order of 'inputs'. Invalid backups are reported and left out.
+            Every snapshot has a distinct name, since the ID maps of the merge are keyed by it.
+        """
+        paths = [os.fspath(source) for source in inputs if isinstance(source, (str, os.PathLike))]
+        by_path = {}
+        if paths:
+            for snapshot in ingest_archives(paths, self.workers):
+                by_path[snapshot.file_path] = snapshot
+
+        snapshots = []
+        names = set()
+        for index, source in enumerate(inputs):
+            if isinstance(source, (str, os.PathLike)):
+                snapshot = by_path.get(os.fspath(source))
+                if snapshot is None:
+                    continue
+            else:
+                # File objects are read in the current process; zipfile needs to seek them
+                if not source.seekable():
+                    source = io.BytesIO(source.read())
+                name = getattr(source, "name", None)
+                name = os.path.basename(name) if isinstance(name, str) else f"backup_{index + 1}.jwlibrary"
+                try:
+                    snapshot = ingest_archive(source, name)
+                except (ValueError, OSError, zipfile.BadZipFile) as e:
+                    print(f"Skipping {name}: {e}")
+                    continue
+
+            name = snapshot.name
+            count = 1
+            while name in names:
+                count += 1
+                name = f"{snapshot.name} ({count})"
+            names.add(name)
+            snapshots.append(snapshot._replace(name=name))
+        return snapshots
+
+    def merge_snapshots(self, snapshots, output, base=None, remapper=None):
+        """
+        Merge ingested backups and write the merged archive.
+
+        Parameters:
+            snapshots (list): SourceSnapshot of every backup, in merge order.
+            output (str or file object): Path of the merged archive, or a seekable binary file object to write it to.
+            base (str, optional): Path to an existing merged archive to add the backups to, instead of the empty template.
+            remapper (IdRemapper, optional): Receives the old -> new IDs given to the records of every backup.
+        """
+        with stage("load"):
+            sources = open_snapshots(snapshots)
+            if base is not None:
+                with zipfile.ZipFile(base, 'r') as zip_ref:
+                    deserialize_database(zip_ref.read("userData.db"), self.merged_conn)
+                media_archives = [base]
+            else:
+                self.template.instantiate(self.merged_conn)
+                media_archives = []
+
+        with stage("merge"):
+            skipped_files = merge_sources(sources, self.merged_conn, self.attach, remapper, self.workers, self.selection)
+        media_archives += [snapshot.file_path for snapshot in snapshots]
+
+        with stage("write"):
+            # Callers that journal the merge, such as the incremental mode, write the new journal afterwards
+            if isinstance(output, (str, os.PathLike)):
+                discard_journal(os.fspath(output))
+            write_merged_archive(self.merged_conn, media_archives, output, skipped_files=skipped_files)
+            if isinstance(output, (str, os.PathLike)):
+                record(bytes_out=os.path.getsize(output))
+
+    def merge(self, inputs, output=None):
+        """
+        Merge backups into a single ".jwlibrary" archive.
+
+        Parameters:
+            inputs (list): Paths to ".jwlibrary" files or binary file objects holding them, in merge order.
+            output (str or file object, optional): Path of the merged archive, or a seekable binary file object to write it to.
+
+        Returns:
+            bytes: The merged archive when 'output' is not given, otherwise None.
+
+        Raises:
+            ValueError: If none of the inputs is a valid backup.
+        """
+        snapshots = self.ingest(inputs)
+        if not snapshots:
+            raise ValueError("No valid .jwlibrary backup to merge")
+
+        if output is not None:
+            self.merge_snapshots(snapshots, output)
+            return None
+
+        buffer = io.BytesIO()
+        self.merge_snapshots(snapshots, buffer)
+        return buffer.getvalue()
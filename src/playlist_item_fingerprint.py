@@ -0,0 +1,62 @@
+import hashlib
+
+
+def playlist_item_fingerprints(conn):
+    """
+    Compute a fingerprint of the content of every playlist item of a database.
+
+    Parameters:
+        conn (sqlite3.Connection): Connection to the database.
+
+    Returns:
+        dict: PlaylistItemId -> fingerprint (hexadecimal SHA-256).
+
+    Description:
+        The fingerprint covers everything that makes up a playlist item: its label, trim offsets,
+        accuracy, end action and thumbnail, the hashes and durations of its media files, the natural
+        keys of its locations, and its markers with their Bible verses. It does not depend on any ID,
+        so the same item exported from two devices has the same fingerprint in both backups.
+        Everything is read with one query per table, not one query per item.
+
+    Example of use:
+        fingerprints = playlist_item_fingerprints(conn)
+    """
+    cursor = conn.cursor()
+    parts = {}
+
+    cursor.execute(
+        "SELECT p.PlaylistItemId, p.Label, p.StartTrimOffsetTicks, p.EndTrimOffsetTicks, p.Accuracy, p.EndAction, m.Hash"
+        " FROM PlaylistItem p LEFT JOIN IndependentMedia m ON m.FilePath = p.ThumbnailFilePath")
+    for playlist_item_id, *item in cursor:
+        parts[playlist_item_id] = [("item", *item)]
+
+    cursor.execute(
+        "SELECT map.PlaylistItemId, m.Hash, map.DurationTicks FROM PlaylistItemIndependentMediaMap map"
+        " JOIN IndependentMedia m ON m.IndependentMediaId = map.IndependentMediaId")
+    for playlist_item_id, *media in cursor:
+        parts.setdefault(playlist_item_id, []).append(("media", *media))
+
+    cursor.execute(
+        "SELECT map.PlaylistItemId, l.KeySymbol, l.MepsLanguage, l.DocumentId, l.BookNumber, l.ChapterNumber, l.Track,"
+        " l.IssueTagNumber, l.Type, map.MajorMultimediaType, map.BaseDurationTicks FROM PlaylistItemLocationMap map"
+        " JOIN Location l ON l.LocationId = map.LocationId")
+    for playlist_item_id, *location in cursor:
+        parts.setdefault(playlist_item_id, []).append(("location", *location))
+
+    cursor.execute("SELECT PlaylistItemMarkerId, VerseId FROM PlaylistItemMarkerBibleVerseMap")
+    verses = {}
+    for marker_id, verse_id in cursor:
+        verses.setdefault(marker_id, []).append(verse_id)
+
+    cursor.execute("SELECT PlaylistItemMarkerId, PlaylistItemId, Label, StartTimeTicks, DurationTicks, EndTransitionDurationTicks FROM PlaylistItemMarker")
+    for marker_id, playlist_item_id, *marker in cursor:
+        parts.setdefault(playlist_item_id, []).append(("marker", *marker, tuple(sorted(verses.get(marker_id, [])))))
+
+    cursor.close()
+
+    # Rows of a table that point to a missing item are not part of any fingerprint
+    return {
+        playlist_item_id: hashlib.sha256(repr(sorted(item_parts, key=repr)).encode("utf-8")).hexdigest()
+        for playlist_item_id, item_parts in parts.items()
+        if item_parts[0][0] == "item"
+    }
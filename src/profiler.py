@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import cProfile
+from contextlib import contextmanager
+
+# Profiler of the current run, or None when the run is not being profiled
+active_profiler = None
+
+
+class Profiler:
+    """
+    Record the wall time, CPU time and counters of every stage of a merge.
+
+    Stages can be nested, for example one stage per table inside the "merge" stage, and are reported
+    by their path ("merge/PlaylistItem"). A stage that runs several times, such as a table merged
+    once for each source, is reported once with the sum of all its runs. The counters used by the
+    program are "rows_read", "rows_written", "collisions" (records mapped to an existing row),
+    "bytes_in" and "bytes_out".
+
+    Parameters:
+        cprofile_dir (str, optional): Folder where a cProfile file ("<stage>.prof") is written for
+            every top-level stage. Nested stages are covered by the profile of their top-level stage.
+
+    Example of use:
+        profiler = Profiler()
+        with profiler.stage("merge"):
+            profiler.record(rows_read=10, rows_written=8, collisions=2)
+        profiler.write_report("merge_report.json")
+    """
+
+    def __init__(self, cprofile_dir=None):
+        self.cprofile_dir = cprofile_dir
+        # stage path -> {"calls", "wall_time", "cpu_time", "counters"}, in the order the stages started
+        self.stages = {}
+        self.stack = []
+        self.started_at = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Measure the code run inside the 'with' block as the stage 'name'.
+        """
+        path = "/".join(self.stack + [name])
+        stats = self.stages.setdefault(path, {"calls": 0, "wall_time": 0.0, "cpu_time": 0.0, "counters": {}})
+
+        profile = None
+        if self.cprofile_dir and not self.stack:
+            profile = cProfile.Profile()
+
+        self.stack.append(name)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profile:
+            profile.enable()
+        try:
+            yield stats
+        finally:
+            if profile:
+                profile.disable()
+            stats["calls"] += 1
+            stats["wall_time"] += time.perf_counter() - wall_start
+            stats["cpu_time"] += time.process_time() - cpu_start
+            self.stack.pop()
+            if profile:
+                os.makedirs(self.cprofile_dir, exist_ok=True)
+                profile.dump_stats(os.path.join(self.cprofile_dir, f"{name}.prof"))
+
+    def record(self, **counters):
+        """
+        Add the given counters to the innermost running stage.
+        """
+        if not self.stack:
+            return
+        stage_counters = self.stages["/".join(self.stack)]["counters"]
+        for counter, value in counters.items():
+            stage_counters[counter] = stage_counters.get(counter, 0) + value
+
+    def report(self):
+        """
+        Return the report of the run as a dictionary that can be saved as JSON.
+        """
+        return {
+            "total_wall_time": round(time.perf_counter() - self.started_at, 6),
+            "stages": [
+                {
+                    "stage": path,
+                    "calls": stats["calls"],
+                    "wall_time": round(stats["wall_time"], 6),
+                    "cpu_time": round(stats["cpu_time"], 6),
+                    **stats["counters"],
+                }
+                for path, stats in self.stages.items()
+            ],
+        }
+
+    def write_report(self, report_path):
+        """
+        Write the report of the run to a JSON file.
+        """
+        with open(report_path, 'w', encoding='utf-8') as report_file:
+            json.dump(self.report(), report_file, indent=4)
+        print(f"Profiling report written to '{report_path}'.")
+
+
+def start_profiling(cprofile_dir=None):
+    """
+    Create the profiler of the current run, used by 'stage' and 'record'.
+
+    Returns:
+        Profiler: The active profiler.
+    """
+    global active_profiler
+    active_profiler = Profiler(cprofile_dir)
+    return active_profiler
+
+
+@contextmanager
+def stage(name):
+    """
+    Measure a stage with the active profiler. Does nothing when the run is not being profiled.
+
+    Example of use:
+        with stage("zip"):
+            zip_merged_folder("merged")
+    """
+    if active_profiler is None:
+        yield None
+        return
+    with active_profiler.stage(name) as stats:
+        yield stats
+
+
+def record(**counters):
+    """
+    Add counters to the running stage of the active profiler. Does nothing when the run is not being profiled.
+
+    Example of use:
+        record(rows_read=len(records), rows_written=len(new_records))
+    """
+    if active_profiler is not None:
+        active_profiler.record(**counters)
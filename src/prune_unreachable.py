@@ -0,0 +1,58 @@
+from .table_descriptor import table_descriptors
+
+
+def prune_unreachable(merged_conn):
+    """
+    Remove the locations and media of the merged database that no other record refers to.
+
+    Parameters:
+        merged_conn (sqlite3.Connection): Connection to the merged database. The caller commits the change.
+
+    Returns:
+        dict: Table -> number of records removed, for every table with the "prune" rule of TABLE_RULES.
+
+    Description:
+        A "Location" or "IndependentMedia" record only exists to be referred to: by a playlist item,
+        one of its maps or thumbnail, a note, a highlight, a bookmark, an input field or a tag. The
+        function walks the foreign keys of every other table, as described by 'table_descriptors', and
+        builds a set of the values they refer to (LocationIds, IndependentMediaIds and FilePaths).
+        The records whose key and referenced values are all missing from those sets are removed, and
+        their media files are then left out of the merged archive, without being read from the source archives.
+
+    Example of use:
+        removed = prune_unreachable(merged_conn)
+    """
+    descriptors = table_descriptors()
+    cursor = merged_conn.cursor()
+    removed = {}
+
+    for pruned in descriptors:
+        if not pruned.prune or pruned.key_column is None:
+            continue
+
+        # Set index of the values of the table that the other tables refer to, by referenced column
+        reachable = {}
+        for descriptor in descriptors:
+            if descriptor.skip or descriptor.name == pruned.name:
+                continue
+            for column, (parent, parent_column) in descriptor.foreign_keys.items():
+                if parent != pruned.name:
+                    continue
+                cursor.execute(f"SELECT DISTINCT {column} FROM {descriptor.name} WHERE {column} IS NOT NULL")
+                reachable.setdefault(parent_column, set()).update(value for (value,) in cursor)
+
+        if not reachable:
+            # No table of the schema refers to this one, so its records cannot be told apart
+            continue
+
+        columns = list(reachable)
+        cursor.execute(f"SELECT {', '.join([pruned.key_column] + columns)} FROM {pruned.name}")
+        unreachable = [(key,) for key, *values in cursor.fetchall()
+                       if not any(value in reachable[column] for column, value in zip(columns, values))]
+
+        cursor.executemany(f"DELETE FROM {pruned.name} WHERE {pruned.key_column} = ?", unreachable)
+        removed[pruned.name] = len(unreachable)
+        print(f"'{pruned.name}' table: {len(unreachable)} records no other record refers to were removed.")
+
+    cursor.close()
+    return removed
@@ -0,0 +1,137 @@
+from collections import namedtuple
+from fnmatch import fnmatchcase
+
+from .table_descriptor import table_descriptors
+
+# Playlist items to be merged, instead of every record of the backups:
+# - tags: names of the tags or playlists whose items are selected, as shell patterns ("Meeting*").
+# - labels: patterns matched against the label of every playlist item.
+# The names and labels are compared without regard to case. When both are given, an item must match both.
+PlaylistSelection = namedtuple("PlaylistSelection", ["tags", "labels"], defaults=((), ()))
+
+
+def matches(value, patterns):
+    """
+    Tell whether a name matches any of the shell patterns, without regard to case.
+    """
+    return any(fnmatchcase(value.casefold(), pattern.casefold()) for pattern in patterns)
+
+
+def select_playlist_items(sources, selection):
+    """
+    Remove from the source databases every record that does not belong to the selected playlist items.
+
+    Parameters:
+        sources (list): List of (name, sqlite3.Connection) tuples of the databases to be merged. The
+            databases are changed and committed, so they must be copies, such as the extracted or in-memory ones.
+        selection (PlaylistSelection): The tags and labels of the playlist items to keep.
+
+    Returns:
+        set: Names of the media files of the records removed, which must not be read from the source archives.
+
+    Description:
+        The selected playlist items are kept with the records that refer to them, directly or through
+        another kept record (their markers, media and location maps and tag maps). When tags are given,
+        only the tag maps of those tags are kept. Every other record is kept only when a kept record
+        refers to it, such as the tags, locations, media and accuracies of the items, so the notes,
+        highlights, bookmarks and input fields of the backups are left out. The tables are walked with
+        the foreign keys described by 'table_descriptors', the dependent tables parents first and the
+        others children first, so every table is decided once the tables it depends on are.
+
+    Example of use:
+        removed_files = select_playlist_items(sources, PlaylistSelection(tags=["Meeting*"]))
+    """
+    descriptors = [descriptor for descriptor in table_descriptors() if not descriptor.skip]
+
+    # PlaylistItem and the tables that refer to it, directly or through another one of them
+    dependent = ["PlaylistItem"]
+    for descriptor in descriptors:
+        if any(parent in dependent for parent, _ in descriptor.foreign_keys.values() if parent != descriptor.name):
+            dependent.append(descriptor.name)
+    dependent_descriptors = [descriptor for descriptor in descriptors if descriptor.name in dependent]
+    other_descriptors = [descriptor for descriptor in reversed(descriptors) if descriptor.name not in dependent]
+
+    removed_files = set()
+    for name, conn in sources:
+        cursor = conn.cursor()
+
+        # The triggers would update "LastModified" once per removed record; it is set once in the merged database
+        for (trigger,) in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+            cursor.execute(f"DROP TRIGGER {trigger}")
+
+        items = None
+        if selection.labels:
+            cursor.execute("SELECT PlaylistItemId, Label FROM PlaylistItem")
+            items = {item_id for item_id, label in cursor if matches(label, selection.labels)}
+        tag_ids = None
+        if selection.tags:
+            cursor.execute("SELECT TagId, Name FROM Tag")
+            tag_ids = {tag_id for tag_id, tag_name in cursor if matches(tag_name, selection.tags)}
+            cursor.execute("SELECT TagId, PlaylistItemId FROM TagMap WHERE PlaylistItemId IS NOT NULL")
+            tagged = {item_id for tag_id, item_id in cursor if tag_id in tag_ids}
+            items = tagged if items is None else items & tagged
+
+        # (table, column) -> values of the kept records of the dependent tables, and values the kept records refer to
+        kept = {("PlaylistItem", "PlaylistItemId"): items}
+        reachable = {}
+
+        for descriptor in dependent_descriptors + other_descriptors:
+            is_dependent = descriptor.name in dependent
+            identity = ([descriptor.key_column] if descriptor.key_column else []) + descriptor.referenced_columns
+            if not is_dependent and not any((descriptor.name, column) in reachable for column in identity):
+                # No kept record refers to the table, such as "Note", so all its records are removed at once
+                if "FilePath" in identity:
+                    removed_files.update(file_path for (file_path,) in cursor.execute(f"SELECT FilePath FROM {descriptor.name}"))
+                cursor.execute(f"DELETE FROM {descriptor.name}")
+                continue
+
+            columns = list(dict.fromkeys(list(descriptor.primary_key) + identity + list(descriptor.foreign_keys)))
+            cursor.execute(f"SELECT {', '.join(columns)} FROM {descriptor.name}")
+
+            removed = []
+            kept_keys = []
+            for values in cursor.fetchall():
+                row = dict(zip(columns, values))
+                if descriptor.name == "PlaylistItem":
+                    keep = row["PlaylistItemId"] in items
+                elif is_dependent:
+                    # Every reference to a dependent record must be to a kept one, and there must be at least one
+                    references = [(kept.get((parent, parent_column), ()), row[column])
+                                  for column, (parent, parent_column) in descriptor.foreign_keys.items()
+                                  if parent in dependent and row[column] is not None]
+                    keep = bool(references) and all(value in kept_values for kept_values, value in references)
+                    if keep and tag_ids is not None and descriptor.name == "TagMap":
+                        keep = row["TagId"] in tag_ids
+                else:
+                    keep = any(row[column] in reachable.get((descriptor.name, column), ()) for column in identity)
+
+                if not keep:
+                    removed.append(tuple(row[column] for column in descriptor.primary_key))
+                    if "FilePath" in row:
+                        removed_files.add(row["FilePath"])
+                    continue
+                kept_keys.append(row[descriptor.primary_key[0]])
+                if is_dependent:
+                    for column in identity:
+                        kept.setdefault((descriptor.name, column), set()).add(row[column])
+                for column, (parent, parent_column) in descriptor.foreign_keys.items():
+                    if row[column] is not None:
+                        reachable.setdefault((parent, parent_column), set()).add(row[column])
+
+            if removed and not kept_keys:
+                cursor.execute(f"DELETE FROM {descriptor.name}")
+            elif descriptor.key_column and len(kept_keys) < len(removed):
+                # Most records are removed, such as the locations of the notes, so the kept ones are listed instead
+                cursor.execute("CREATE TEMP TABLE kept_keys (Id INTEGER PRIMARY KEY)")
+                cursor.executemany("INSERT INTO temp.kept_keys VALUES (?)", ((key,) for key in kept_keys))
+                cursor.execute(f"DELETE FROM {descriptor.name} WHERE {descriptor.key_column} NOT IN (SELECT Id FROM temp.kept_keys)")
+                cursor.execute("DROP TABLE temp.kept_keys")
+            elif removed:
+                condition = " AND ".join(f"{column} = ?" for column in descriptor.primary_key)
+                cursor.executemany(f"DELETE FROM {descriptor.name} WHERE {condition}", removed)
+
+        conn.commit()
+        cursor.close()
+        print(f"{name}: {len(items)} playlist items selected.")
+
+    return removed_files
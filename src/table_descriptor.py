@@ -0,0 +1,171 @@
+from functools import lru_cache
+
+from .playlist_item_fingerprint import playlist_item_fingerprints
+from .template_schema import template_schema
+
+# Merge rules that the schema cannot express. Every other table is merged only from its keys.
+# - skip: the table is not merged, such as "LastModified", which is updated once at the end.
+# - natural_keys: extra columns that identify a row, compared with NULLs as equal values.
+# - fingerprint: function returning {key: fingerprint} for the rows of a database; rows with the
+#   same fingerprint as a row merged from another database are the same row.
+# - optional_references: foreign keys set to NULL, instead of dropping the row, when the parent is missing.
+# - position: (group column, position column); the positions of each group are numbered again
+#   after the rows the group already has in the merged database.
+# - prune: rows that no other table refers to are removed from the merged database after the merge.
+TABLE_RULES = {
+    "LastModified": {"skip": True},
+    # Media with the same content collapse into a single file, whatever its name
+    "IndependentMedia": {"natural_keys": [("Hash",)], "prune": True},
+    # The same publication, language, document, book, chapter, track, issue and type is the same location
+    "Location": {"natural_keys": [("KeySymbol", "MepsLanguage", "DocumentId", "BookNumber", "ChapterNumber", "Track", "IssueTagNumber", "Type")],
+                 "prune": True},
+    # Highlights of a user mark merged from another device are the same ranges
+    "BlockRange": {"natural_keys": [("UserMarkId", "BlockType", "Identifier", "StartToken", "EndToken")]},
+    # Playlist items exported from several devices are merged once
+    "PlaylistItem": {"fingerprint": playlist_item_fingerprints, "optional_references": ("ThumbnailFilePath",)},
+    # The items of a tag are appended after the items it already has
+    "TagMap": {"position": ("TagId", "Position")},
+}
+
+
+class TableDescriptor:
+    """
+    Describe how a table of "userData.db" is merged, from the template schema and TABLE_RULES.
+
+    Attributes:
+        name (str): Name of the table.
+        columns (list): Columns of the table, in the order of the table.
+        column_list (str): The columns joined by commas, as cached by the template schema for INSERT ... SELECT.
+        insert_sql (str): The "INSERT INTO <table> (<columns>) VALUES (?, ...)" of the table, cached by the template schema.
+        key_column (str or None): The INTEGER PRIMARY KEY column, whose IDs are shifted by the offset of
+            each source. None for the tables keyed by their columns, such as the map tables.
+        primary_key (tuple): Columns of the primary key.
+        foreign_keys (dict): Column -> (parent table, parent column).
+        not_null (set): Columns declared NOT NULL.
+        match_keys (list): (columns, nulls_match) of the keys that identify a row already in the merged database:
+            the UNIQUE constraints (and the primary key of the tables without a key column), whose NULLs never match,
+            followed by the natural keys of TABLE_RULES, whose NULLs match.
+        referenced_columns (list): Columns other than the key column that other tables refer to, such as "FilePath".
+        skip, fingerprint, optional_references, position, prune: The rules of the table in TABLE_RULES.
+    """
+
+    def __init__(self, schema, name):
+        rules = TABLE_RULES.get(name, {})
+        cursor = schema.conn.cursor()
+
+        self.name = name
+        self.columns = list(schema.columns[name])
+        self.column_list = schema.column_lists[name]
+        self.insert_sql = schema.insert_sql[name]
+        table_info = cursor.execute(f"PRAGMA table_info('{name}')").fetchall()
+        self.not_null = {row[1] for row in table_info if row[3]}
+        self.column_types = {row[1]: row[2] for row in table_info}
+        self.primary_key = tuple(row[1] for row in sorted(table_info, key=lambda row: row[5]) if row[5])
+        is_without_rowid = "WITHOUT ROWID" in next(sql for _, table, sql in schema.ddl if table == name).upper()
+        self.key_column = None
+        if len(self.primary_key) == 1 and self.column_types[self.primary_key[0]].upper() == "INTEGER" and not is_without_rowid:
+            self.key_column = self.primary_key[0]
+
+        self.foreign_keys = {row[3]: (row[2], row[4]) for row in cursor.execute(f"PRAGMA foreign_key_list('{name}')")}
+
+        self.skip = rules.get("skip", False)
+        self.fingerprint = rules.get("fingerprint")
+        self.optional_references = set(rules.get("optional_references", ()))
+        self.position = rules.get("position")
+        self.prune = rules.get("prune", False)
+
+        unique_keys = []
+        for index in cursor.execute(f"PRAGMA index_list('{name}')").fetchall():
+            if index[3] in ("u", "pk"):
+                unique_keys.append(tuple(row[2] for row in cursor.execute(f"PRAGMA index_info('{index[1]}')")))
+        if self.key_column is None and self.primary_key and self.primary_key not in unique_keys:
+            unique_keys.insert(0, self.primary_key)
+        if self.position:
+            # Positions are given again by the merge, so they do not identify a row
+            unique_keys = [key for key in unique_keys if self.position[1] not in key]
+        self.match_keys = [(key, False) for key in unique_keys]
+        self.match_keys += [(tuple(key), True) for key in rules.get("natural_keys", ())]
+
+        # Filled by 'table_descriptors' once every table is known
+        self.referenced_columns = []
+        cursor.close()
+
+    def __repr__(self):
+        return f"TableDescriptor({self.name!r}, key_column={self.key_column!r}, foreign_keys={self.foreign_keys!r})"
+
+
+def merge_order(descriptors):
+    """
+    Sort the tables so every table comes after the tables its foreign keys refer to.
+
+    Parameters:
+        descriptors (dict): Table -> TableDescriptor, in the order of the template.
+
+    Returns:
+        list: The descriptors, parents first. Tables with no order between them keep the order of the template.
+    """
+    ordered = []
+    done = set()
+    pending = list(descriptors.values())
+    while pending:
+        for descriptor in pending:
+            parents = {parent for parent, _ in descriptor.foreign_keys.values() if parent != descriptor.name}
+            if parents <= done:
+                break
+        else:
+            raise ValueError(f"Foreign key cycle between the tables {[descriptor.name for descriptor in pending]}")
+        ordered.append(descriptor)
+        done.add(descriptor.name)
+        pending.remove(descriptor)
+    return ordered
+
+
+def merge_levels(descriptors):
+    """
+    Group the tables into levels of the foreign key dependency graph.
+
+    Parameters:
+        descriptors (list): TableDescriptor of every table, parents first, as returned by 'table_descriptors'.
+
+    Returns:
+        list: One list of descriptors per level. The tables of level 0 refer to no other table, and every
+        other table is in the level after the deepest of its parents, so the tables of a level do not
+        depend on each other and can be merged at the same time once the previous levels are merged.
+
+    Example of use:
+        for level in merge_levels(table_descriptors()):
+            print([descriptor.name for descriptor in level])
+    """
+    depth = {}
+    levels = []
+    for descriptor in descriptors:
+        parents = [parent for parent, _ in descriptor.foreign_keys.values() if parent != descriptor.name]
+        depth[descriptor.name] = max((depth[parent] + 1 for parent in parents), default=0)
+        if depth[descriptor.name] == len(levels):
+            levels.append([])
+        levels[depth[descriptor.name]].append(descriptor)
+    return levels
+
+
+@lru_cache(maxsize=None)
+def table_descriptors():
+    """
+    Return the descriptors of every table of the template schema, in merge order.
+
+    Returns:
+        list: TableDescriptor of every table, parents before the tables that refer to them.
+
+    Example of use:
+        for descriptor in table_descriptors():
+            print(descriptor.name, descriptor.key_column, descriptor.foreign_keys)
+    """
+    schema = template_schema()
+    descriptors = {name: TableDescriptor(schema, name) for name in schema.columns}
+
+    for descriptor in descriptors.values():
+        for parent, parent_column in descriptor.foreign_keys.values():
+            parent_descriptor = descriptors[parent]
+            if parent_column != parent_descriptor.key_column and parent_column not in parent_descriptor.referenced_columns:
+                parent_descriptor.referenced_columns.append(parent_column)
+
+    return merge_order(descriptors)
@@ -0,0 +1,106 @@
+import sqlite3
+from functools import lru_cache
+
+from .load_user_data import TEMPLATE_DB_PATH, deserialize_database
+
+
+class TemplateSchema:
+    """
+    Schema of the template "userData.db", captured once and instantiated into new databases.
+
+    Parameters:
+        template_path (str, optional): Path to the template database. Defaults to the one bundled in "src".
+
+    Attributes:
+        ddl (list): (type, name, sql) of every table, index and trigger of the template, in creation order.
+        seed_rows (dict): Table -> rows of the tables that are not empty in the template, such as "PlaylistItemAccuracy".
+        user_version (int): The "PRAGMA user_version" of the template, that is, the schema version of JW Library.
+        columns (dict): Table -> list of its columns, in the order of the table.
+        column_lists (dict): Table -> its columns joined by commas, to be used in INSERT ... SELECT statements.
+        insert_sql (dict): Table -> "INSERT INTO <table> (<columns>) VALUES (?, ...)".
+        insert_or_ignore_sql (dict): Table -> the same statement with "INSERT OR IGNORE".
+
+    Description:
+        The template is loaded into an in-memory database that is never written to. New databases are
+        created from it with the SQLite backup API, which copies its pages as they are, so the tables,
+        indexes, triggers, seed rows and user_version come with them and no table needs to be created
+        by the merge. The statements of every table are built from the real schema, so they cannot
+        disagree with it.
+
+    Example of use:
+        schema = template_schema()
+        merged_conn = schema.instantiate()
+        merged_conn.executemany(schema.insert_sql["Tag"], [(1, 2, "Playlist")])
+    """
+
+    def __init__(self, template_path=TEMPLATE_DB_PATH):
+        with open(template_path, 'rb') as template_file:
+            # The template is only read, so the server threads can copy it at the same time
+            self.conn = deserialize_database(template_file.read(), sqlite3.connect(":memory:", check_same_thread=False))
+
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL ORDER BY rowid")
+        self.ddl = cursor.fetchall()
+        self.user_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+
+        self.columns = {}
+        self.seed_rows = {}
+        for object_type, table, _ in self.ddl:
+            if object_type != "table" or table.startswith("sqlite_"):
+                continue
+            self.columns[table] = [row[1] for row in cursor.execute(f"PRAGMA table_info('{table}')")]
+            rows = cursor.execute(f"SELECT * FROM {table}").fetchall()
+            if rows:
+                self.seed_rows[table] = rows
+        cursor.close()
+
+        self.column_lists = {table: ", ".join(columns) for table, columns in self.columns.items()}
+        self.insert_sql = {}
+        self.insert_or_ignore_sql = {}
+        for table, columns in self.columns.items():
+            values = f"({self.column_lists[table]}) VALUES ({', '.join('?' * len(columns))})"
+            self.insert_sql[table] = f"INSERT INTO {table} {values}"
+            self.insert_or_ignore_sql[table] = f"INSERT OR IGNORE INTO {table} {values}"
+
+    def instantiate(self, conn=None):
+        """
+        Copy the template into a database with the SQLite backup API.
+
+        Parameters:
+            conn (sqlite3.Connection, optional): Connection whose "main" database is replaced by the template.
+                A new in-memory connection is created when it is not given.
+
+        Returns:
+            sqlite3.Connection: The connection holding the new copy of the template.
+        """
+        if conn is None:
+            conn = sqlite3.connect(":memory:")
+        self.conn.backup(conn)
+        return conn
+
+    def instantiate_file(self, file_path):
+        """
+        Write a copy of the template to a database file, replacing its content.
+
+        Parameters:
+            file_path (str): Path to the database file.
+        """
+        conn = sqlite3.connect(file_path)
+        try:
+            self.instantiate(conn)
+        finally:
+            conn.close()
+
+
+@lru_cache(maxsize=None)
+def template_schema(template_path=TEMPLATE_DB_PATH):
+    """
+    Return the TemplateSchema of a template database, captured the first time it is needed in the process.
+
+    Parameters:
+        template_path (str, optional): Path to the template database. Defaults to the one bundled in "src".
+
+    Returns:
+        TemplateSchema: The cached schema of the template.
+    """
+    return TemplateSchema(template_path)
@@ -1,5 +1,5 @@
-import random
 import os
+import sqlite3
 
 def count_db(folder):
     """
@@ -24,17 +24,27 @@ def count_db(folder):
     return count
 
 
-def random_id():
+
+def open_db_folder(folder):
     """
-    Gera um ID aleatório composto por três dígitos.
+    Abre todos os arquivos de banco de dados (.db) encontrados na pasta especificada.
+
+    Parâmetros:
+        folder (str): O caminho para a pasta com os bancos de dados.
 
     Retorno:
-        id_aleatorio (int): Um ID aleatório de três dígitos.
+        sources (list): Lista de tuplas (nome do arquivo, conexão sqlite3), uma para cada banco de dados.
 
     Descrição:
-        A função utiliza a biblioteca 'random' para gerar números aleatórios.
-        O ID aleatório é composto por três dígitos, onde o primeiro dígito é um número entre 1 e 9 (inclusivo),
-        e os outros dois dígitos são números entre 0 e 9 (inclusivo).
-        O ID aleatório é retornado como resultado da função.
+        Os bancos são abertos em uma ordem fixa, então os IDs do banco mesclado não dependem do sistema de arquivos.
+        Cada banco de dados é aberto uma única vez e a mesma conexão é usada por todas as funções de mesclagem,
+        inclusive pelas threads que mesclam as tabelas independentes ao mesmo tempo.
+        Quem chama a função é responsável por fechar as conexões.
     """
-    return random.randint(100, 999)
+    sources = []
+    # Ordenados pelo tamanho e depois pelo nome, para que "userData(2).db" venha antes de "userData(10).db"
+    # e a ordem da mesclagem seja a ordem em que os arquivos foram extraídos, em qualquer sistema de arquivos
+    for file in sorted(os.listdir(folder), key=lambda file: (len(file), file)):
+        if file.endswith(".db"):
+            sources.append((file, sqlite3.connect(os.path.join(folder, file), check_same_thread=False)))
+    return sources
@@ -0,0 +1,285 @@
+import os
+import json
+import contextlib
+import hashlib
+import struct
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .create_manifest_json import build_manifest_data
+from .zip_record_writer import ZipRecordWriter
+
+# Compression methods whose data can be copied as is into the merged archive
+RAW_COPY_METHODS = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+# Size of the fixed part of a local file header
+LOCAL_HEADER_SIZE = 30
+
+# Signatures (offset, bytes) of file types that are already compressed, so deflating them again only costs time
+COMPRESSED_SIGNATURES = (
+    (0, b"\xff\xd8\xff"),        # JPEG
+    (0, b"\x89PNG\r\n\x1a\n"),   # PNG
+    (0, b"GIF8"),                # GIF
+    (0, b"PK\x03\x04"),          # ZIP
+    (0, b"ID3"),                 # MP3
+    (0, b"\x1aE\xdf\xa3"),        # Matroska / WebM
+    (4, b"ftyp"),                # MP4, MOV, M4V, M4A
+    (8, b"WEBP"),                # WebP
+)
+
+# Size of the sample used to decide whether a member is worth deflating
+PROBE_SIZE = 64 * 1024
+# A sample that does not shrink below this fraction of its size is stored instead of deflated
+MIN_COMPRESSION_RATIO = 0.9
+CHUNK_SIZE = 1024 * 1024
+
+
+def iter_chunks(source):
+    """
+    Yield the content of a member in chunks of CHUNK_SIZE bytes.
+
+    Parameters:
+        source (bytes or str): Content of the member, or path to the file that holds it.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), CHUNK_SIZE):
+            yield view[start:start + CHUNK_SIZE]
+        return
+
+    with open(source, 'rb') as source_file:
+        while True:
+            chunk = source_file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def is_compressible(head):
+    """
+    Tell whether a member is worth deflating, from the first bytes of its content.
+
+    Parameters:
+        head (bytes): Up to PROBE_SIZE bytes from the start of the member.
+
+    Returns:
+        bool: False for known compressed formats (JPEG, PNG, MP4, ...) and for content whose
+        sample does not shrink when deflated at the fastest level, True otherwise.
+    """
+    for offset, signature in COMPRESSED_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return False
+    if not head:
+        return False
+    return len(zlib.compress(head, 1)) < len(head) * MIN_COMPRESSION_RATIO
+
+
+def prepare_member(file_name, source, digest=None):
+    """
+    Compute the header and the data of a member of the merged archive.
+
+    Parameters:
+        file_name (str): Name of the member in the archive.
+        source (bytes or str): Content of the member, or path to the file that holds it.
+        digest (hashlib object, optional): Updated with the content of the member, in the same read that computes its CRC.
+
+    Returns:
+        tuple: (header, chunks), where 'header' holds the keyword arguments of 'ZipRecordWriter.write_member'.
+        Compressible members are deflated with a raw zlib stream and 'chunks' holds the compressed bytes.
+        Other members are stored and 'chunks' reads the 'source' while the member is written, so large
+        media files are streamed into the archive instead of being kept in memory, and read only once.
+
+    Description:
+        The function does not touch the archive, so several members can be prepared at the same time in threads.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        head = bytes(source[:PROBE_SIZE])
+        date_time = time.localtime()[:6]
+        file_size = len(source)
+    else:
+        with open(source, 'rb') as source_file:
+            head = source_file.read(PROBE_SIZE)
+        date_time = time.localtime(os.path.getmtime(source))[:6]
+        file_size = os.path.getsize(source)
+    header = {"file_name": file_name, "date_time": date_time, "file_size": file_size}
+
+    if not is_compressible(head):
+        header["compress_type"] = zipfile.ZIP_STORED
+        chunks = iter_chunks(source)
+        if digest is not None:
+            chunks = (digest.update(chunk) or chunk for chunk in chunks)
+        return header, chunks
+
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    parts = []
+    crc = 0
+    for chunk in iter_chunks(source):
+        crc = zlib.crc32(chunk, crc)
+        if digest is not None:
+            digest.update(chunk)
+        parts.append(compressor.compress(chunk))
+    parts.append(compressor.flush())
+    header.update(compress_type=zipfile.ZIP_DEFLATED, crc=crc, compress_size=sum(len(part) for part in parts))
+    return header, parts
+
+
+def write_members(writer, members, workers=None, digests=None):
+    """
+    Add members to the merged archive, deflating the compressible ones in parallel threads.
+
+    Parameters:
+        writer (ZipRecordWriter): Merged archive being written.
+        members (iterable): (file_name, source) pairs, where 'source' is the content of the member or the path to its file.
+        workers (int, optional): Number of threads. Defaults to the number of CPUs.
+        digests (dict, optional): File name -> hashlib object updated with the content of that member
+            while it is written, so its hash needs no second read. Complete once the function returns.
+
+    Description:
+        The members are prepared by a pool of threads, a few ahead of the one being written, since zlib
+        releases the GIL while it compresses and computes the CRC, and written to the archive in the order
+        of 'members', so the archive is the same on every run.
+
+    Example of use:
+        write_members(writer, [("userData.db", data), ("video.mp4", "merged/video.mp4")])
+    """
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for file_name, source in members:
+            digest = digests.get(file_name) if digests else None
+            pending.append(executor.submit(prepare_member, file_name, source, digest))
+            if len(pending) >= workers * 2:
+                header, chunks = pending.popleft().result()
+                writer.write_member(chunks=chunks, **header)
+        while pending:
+            header, chunks = pending.popleft().result()
+            writer.write_member(chunks=chunks, **header)
+
+
+def read_raw_data(archive, file_info):
+    """
+    Yield the data of a member of a source archive as it is stored, without decompressing it.
+
+    Parameters:
+        archive (file object): The source archive, opened for binary reading.
+        file_info (zipfile.ZipInfo): Member to be read, whose 'header_offset' locates its local header.
+
+    Raises:
+        zipfile.BadZipFile: If the local header is not found or the data is truncated.
+    """
+    # The local header has its own file name and extra field lengths, which may differ from the central directory
+    archive.seek(file_info.header_offset)
+    local_header = archive.read(LOCAL_HEADER_SIZE)
+    if len(local_header) != LOCAL_HEADER_SIZE or local_header[:4] != b"PK\x03\x04":
+        raise zipfile.BadZipFile(f"Bad local header of member '{file_info.filename}'")
+    name_length, extra_length = struct.unpack("<2H", local_header[26:30])
+    archive.seek(name_length + extra_length, os.SEEK_CUR)
+
+    remaining = file_info.compress_size
+    while remaining > 0:
+        chunk = archive.read(min(remaining, CHUNK_SIZE))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated member '{file_info.filename}'")
+        remaining -= len(chunk)
+        yield chunk
+
+
+def copy_member(zip_ref, archive, file_info, writer, file_name):
+    """
+    Copy a member of a source archive into the merged archive.
+
+    Parameters:
+        zip_ref (zipfile.ZipFile): Source archive, opened for reading.
+        archive (file object): The same source archive, opened for binary reading, to read the raw data of its members.
+        file_info (zipfile.ZipInfo): Member of the source archive to be copied.
+        writer (ZipRecordWriter): Merged archive being written.
+        file_name (str): Name of the member in the merged archive.
+
+    Description:
+        Members stored or deflated in the source archive are copied as raw compressed bytes, with the
+        CRC and sizes of the source, without being inflated and deflated again. Members compressed with
+        other methods, such as bzip2 or LZMA, are read through 'zip_ref' and written like the new members.
+        The date and attributes of the member are kept.
+    """
+    if file_info.compress_type in RAW_COPY_METHODS and not file_info.flag_bits & 0x01:
+        writer.write_member(file_name, file_info.date_time, file_info.compress_type, read_raw_data(archive, file_info),
+                            crc=file_info.CRC, file_size=file_info.file_size, compress_size=file_info.compress_size,
+                            external_attr=file_info.external_attr or 0o600 << 16)
+        return
+
+    header, chunks = prepare_member(file_name, zip_ref.read(file_info))
+    header["date_time"] = file_info.date_time
+    writer.write_member(chunks=chunks, external_attr=file_info.external_attr or 0o600 << 16, **header)
+
+
+def open_source(file_path):
+    """
+    Open a source archive given by its path, or use the binary file object that holds it, which is left open.
+    """
+    if isinstance(file_path, (str, os.PathLike)):
+        return open(file_path, 'rb')
+    return contextlib.nullcontext(file_path)
+
+
+def write_merged_archive(merged_conn, jwlibrary_files, output="merged_playlist.jwlibrary", skipped_files=()):
+    """
+    Write the merged ".jwlibrary" file straight from the in-memory merged database and the source archives.
+
+    Parameters:
+        merged_conn (sqlite3.Connection): Connection to the merged database.
+        jwlibrary_files (list): Paths to the source ".jwlibrary" files, or seekable binary file objects holding them, in merge order.
+        output (str or file object, optional): Path of the archive to be created, or a seekable binary file object to write it to.
+        skipped_files (set, optional): Media files left out of the archive, such as the ones collapsed into an identical copy
+            or no longer referred to. They are not read from the source archives.
+
+    Description:
+        The function writes the serialized merged "userData.db" to the archive, computing its SHA-256
+        while it is compressed, then "manifest.json" with that hash and the schema version of the merged
+        database ("PRAGMA user_version"), then copies every media file of the source archives into it,
+        reading each one straight from its source archive. Media files stored or deflated in the source are
+        copied as raw compressed bytes, without being inflated and deflated again; other methods are recompressed.
+        Media files with the same name in several archives are written only once.
+        Nothing is extracted to disk, so no "DB" or "merged" folder is needed. When 'output' is a path, the
+        archive is written to a temporary file that replaces 'output' only once it is complete, so an existing
+        merged archive can be one of the sources; the temporary file is removed if the writing fails.
+
+    Example of use:
+        write_merged_archive(merged_conn, ["backup1.jwlibrary", "backup2.jwlibrary"])
+    """
+    is_path = isinstance(output, (str, os.PathLike))
+    temp_path = os.fspath(output) + ".tmp" if is_path else None
+
+    try:
+        with open(temp_path, 'wb') if is_path else contextlib.nullcontext(output) as output_file, \
+                ZipRecordWriter(output_file) as writer:
+            database_hash = hashlib.sha256()
+            write_members(writer, [("userData.db", merged_conn.serialize())], digests={"userData.db": database_hash})
+            schema_version = merged_conn.execute("PRAGMA user_version").fetchone()[0]
+            manifest_data = build_manifest_data(database_hash.hexdigest(), schema_version)
+            write_members(writer, [("manifest.json", json.dumps(manifest_data, indent=4).encode("utf-8"))])
+            written = {"manifest.json", "userData.db"}
+            written.update(skipped_files)
+
+            for file_path in jwlibrary_files:
+                # The raw data of the members is read from the same file as the central directory
+                with open_source(file_path) as archive, zipfile.ZipFile(archive, 'r') as zip_ref:
+                    for file_info in zip_ref.infolist():
+                        file_name = os.path.basename(file_info.filename)
+
+                        # Databases and manifests of the sources are not part of the merged archive
+                        if file_name.endswith(".db") or file_name.endswith(".json") or file_name in written:
+                            continue
+
+                        copy_member(zip_ref, archive, file_info, writer, file_name)
+                        written.add(file_name)
+    except BaseException:
+        # An incomplete archive is never left behind, and 'output' is untouched
+        if is_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    if is_path:
+        os.replace(temp_path, output)
+        print(f"Merged archive written to '{output}' successfully.")
@@ -1,37 +1,68 @@
 import os
-import zipfile
+import json
+import sqlite3
+import hashlib
 
-def zip_merged_folder(merged_dir):
+from .write_merged_archive import write_members
+from .zip_record_writer import ZipRecordWriter
+from .create_manifest_json import build_manifest_data
+
+def zip_merged_folder(merged_dir, zip_path=None, workers=None):
     """
     Compacta a pasta "merged" em um arquivo chamado "merged_playlist.jwlibrary".
 
     Parâmetros:
         merged_dir (str): O caminho para a pasta "merged" que será compactada.
+        zip_path (str, opcional): O caminho do arquivo zip a ser criado. Por padrão, "merged_playlist.jwlibrary"
+            na pasta que contém a pasta "merged", independentemente do diretório atual.
+        workers (int, opcional): Número de threads que comprimem os arquivos. Por padrão, o número de CPUs.
 
     Descrição:
-        A função cria um arquivo zip chamado "merged_playlist.jwlibrary" na pasta raiz do programa.
+        A função cria o arquivo zip em 'zip_path'.
         Em seguida, ela percorre todos os arquivos e subpastas dentro da pasta "merged" e os adiciona ao arquivo zip.
+        Arquivos que já são comprimidos (JPEG, PNG, MP4, ...) ou que não diminuem com a compressão são armazenados
+        sem compressão (STORED); os demais são comprimidos em paralelo, em threads, e gravados na ordem da pasta.
+        Cada arquivo é lido uma única vez.
+        O SHA-256 do "userData.db" é calculado enquanto ele é comprimido, sem uma segunda leitura do arquivo, e
+        o "manifest.json" é criado depois, com esse hash e a versão do esquema do banco, e gravado por último
+        direto no arquivo zip, sem ser escrito na pasta "merged".
         Após adicionar todos os arquivos, o arquivo zip é fechado.
 
     Exemplo de uso:
         zip_merged_folder("caminho_da_pasta_merged")
     """
-    # Nome do arquivo zip a ser criado
-    zip_filename = "merged_playlist.jwlibrary"
-
-    # Caminho completo para o arquivo zip
-    zip_path = os.path.join(os.getcwd(), zip_filename)
+    # Caminho completo para o arquivo zip, ao lado da pasta "merged" se não for informado
+    if zip_path is None:
+        zip_path = os.path.join(os.path.dirname(os.path.abspath(merged_dir)), "merged_playlist.jwlibrary")
 
     # Inicializa o arquivo zip em modo de escrita
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+    with open(zip_path, 'wb') as zip_output, ZipRecordWriter(zip_output) as zip_file:
         # Percorre todos os arquivos e subpastas dentro da pasta "merged"
+        members = []
         for foldername, subfolders, filenames in os.walk(merged_dir):
             for filename in filenames:
                 # Caminho completo para o arquivo atual
                 file_path = os.path.join(foldername, filename)
                 # Caminho relativo para o arquivo dentro do arquivo zip
                 relative_path = os.path.relpath(file_path, merged_dir)
-                # Adiciona o arquivo ao arquivo zip
-                zip_file.write(file_path, relative_path)
+                # O "manifest.json" depende do hash do banco, então é criado depois
+                if relative_path != "manifest.json":
+                    members.append((relative_path, file_path))
+
+        # Adiciona os arquivos ao arquivo zip, escolhendo STORED ou DEFLATED para cada um,
+        # e calcula o hash do "userData.db" na mesma leitura
+        database_hash = hashlib.sha256()
+        write_members(zip_file, members, workers, digests={"userData.db": database_hash})
+
+        # Versão do esquema do banco mesclado, lida do cabeçalho do arquivo
+        conn = sqlite3.connect(os.path.join(merged_dir, "userData.db"))
+        try:
+            schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+
+        # Cria o "manifest.json" com o hash e a versão do esquema e o grava direto no arquivo zip, sem passar pelo disco
+        manifest_data = build_manifest_data(database_hash.hexdigest(), schema_version)
+        write_members(zip_file, [("manifest.json", json.dumps(manifest_data, indent=4).encode("utf-8"))])
 
-    print(f"Pasta 'merged' compactada em '{zip_filename}' com sucesso.")
+    print(f"Pasta 'merged' compactada em '{zip_path}' com sucesso.")
@@ -0,0 +1,158 @@
+import struct
+import zipfile
+import zlib
+
+# Signatures of the records of a ZIP archive
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+CENTRAL_DIRECTORY_SIGNATURE = b"PK\x01\x02"
+ZIP64_END_SIGNATURE = b"PK\x06\x06"
+ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+END_SIGNATURE = b"PK\x05\x06"
+
+# Sizes, offsets and counts from which the ZIP64 records are needed
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+# Versions needed to extract a member: 2.0 for deflate, 4.5 for ZIP64
+DEFAULT_VERSION = 20
+ZIP64_VERSION = 45
+# The external attributes hold Unix permissions
+UNIX_SYSTEM = 3
+# General purpose flags: sizes and CRC in a data descriptor after the data, UTF-8 file name
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+
+def dos_date_time(date_time):
+    """
+    Convert a (year, month, day, hour, minute, second) tuple to the MS-DOS date and time of a ZIP header.
+    """
+    year, month, day, hour, minute, second = date_time
+    if year < 1980:
+        # The MS-DOS date cannot hold earlier years
+        year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+    return (year - 1980) << 9 | month << 5 | day, hour << 11 | minute << 5 | second // 2
+
+
+class ZipRecordWriter:
+    """
+    Write a ZIP archive record by record, from members whose data is already in its final form.
+
+    Parameters:
+        fileobj (file object): Binary file object the archive is written to. It does not need to be seekable.
+
+    Description:
+        Every member is written as a local header, its data as given (stored, or deflated by the caller
+        or in the source archive) and a data descriptor with its CRC and sizes, so a member can be copied
+        from another archive without being decompressed, and a stored member can be written while its CRC
+        is computed, in a single read. 'close' writes the central directory and the end of central directory
+        records, with the ZIP64 records when the archive needs them. The archive can be read by 'zipfile'
+        and by JW Library.
+
+    Example of use:
+        with open("merged.jwlibrary", "wb") as output, ZipRecordWriter(output) as writer:
+            writer.write_member("userData.db", (2024, 1, 1, 0, 0, 0), zipfile.ZIP_STORED, [data], file_size=len(data))
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.offset = 0
+        self.entries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+    def write_bytes(self, data):
+        self.fileobj.write(data)
+        self.offset += len(data)
+
+    def write_member(self, file_name, date_time, compress_type, chunks, crc=None, file_size=None,
+                     compress_size=None, external_attr=0o600 << 16):
+        """
+        Write a member of the archive.
+
+        Parameters:
+            file_name (str): Name of the member in the archive.
+            date_time (tuple): Date and time of the member, as in 'zipfile.ZipInfo.date_time'.
+            compress_type (int): zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED, the form of the data in 'chunks'.
+            chunks (iterable): Data of the member, in order, already in its final form.
+            crc (int, optional): CRC-32 of the uncompressed content. Computed from 'chunks' for stored members when not given.
+            file_size (int, optional): Size of the uncompressed content. Required for deflated members, and used
+                as a hint for stored ones, to decide whether the member needs ZIP64 records.
+            compress_size (int, optional): Size of the data. Counted from 'chunks' when not given.
+            external_attr (int, optional): External attributes of the member, such as its Unix permissions.
+
+        Raises:
+            zipfile.LargeZipFile: If a member without ZIP64 records turns out to be larger than 4 GiB.
+            zipfile.BadZipFile: If the data written does not have the given size.
+        """
+        if crc is None and compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"The CRC of the compressed member '{file_name}' must be given")
+
+        encoded_name = file_name.encode("utf-8")
+        flag_bits = FLAG_DATA_DESCRIPTOR | (FLAG_UTF8 if not file_name.isascii() else 0)
+        zip64 = max(file_size or 0, compress_size or 0) >= ZIP64_LIMIT
+        version = ZIP64_VERSION if zip64 else DEFAULT_VERSION
+        dos_date, dos_time = dos_date_time(date_time)
+        header_offset = self.offset
+
+        # The CRC and the sizes go in the data descriptor; a ZIP64 member announces them in its extra field
+        extra = struct.pack("<HHQQ", 1, 16, 0, 0) if zip64 else b""
+        header_size = ZIP64_LIMIT if zip64 else 0
+        self.write_bytes(struct.pack("<4s5H3L2H", LOCAL_HEADER_SIGNATURE, version, flag_bits, compress_type,
+                                     dos_time, dos_date, 0, header_size, header_size, len(encoded_name), len(extra)))
+        self.write_bytes(encoded_name + extra)
+
+        computed_crc = 0
+        written = 0
+        for chunk in chunks:
+            if crc is None:
+                computed_crc = zlib.crc32(chunk, computed_crc)
+            self.write_bytes(chunk)
+            written += len(chunk)
+        if crc is None:
+            crc, file_size = computed_crc, written
+        if compress_size is not None and written != compress_size:
+            raise zipfile.BadZipFile(f"Member '{file_name}' has {written} bytes instead of {compress_size}")
+        compress_size = written
+        if not zip64 and max(file_size, compress_size) >= ZIP64_LIMIT:
+            raise zipfile.LargeZipFile(f"Member '{file_name}' is larger than 4 GiB, but its size was not given")
+
+        descriptor_format = "<4sLQQ" if zip64 else "<4sLLL"
+        self.write_bytes(struct.pack(descriptor_format, DATA_DESCRIPTOR_SIGNATURE, crc, compress_size, file_size))
+        self.entries.append((encoded_name, version, flag_bits, compress_type, dos_time, dos_date, crc,
+                             compress_size, file_size, external_attr, header_offset))
+
+    def close(self):
+        """
+        Write the central directory and the end of central directory records.
+        """
+        directory_offset = self.offset
+        for (encoded_name, version, flag_bits, compress_type, dos_time, dos_date, crc,
+             compress_size, file_size, external_attr, header_offset) in self.entries:
+            # The values that do not fit in the central directory record go in its ZIP64 extra field, in this order
+            zip64_values = [value for value in (file_size, compress_size, header_offset) if value >= ZIP64_LIMIT]
+            extra = struct.pack(f"<HH{len(zip64_values)}Q", 1, 8 * len(zip64_values), *zip64_values) if zip64_values else b""
+            if zip64_values:
+                version = ZIP64_VERSION
+            self.write_bytes(struct.pack("<4s4B4HL2L5H2L", CENTRAL_DIRECTORY_SIGNATURE, version, UNIX_SYSTEM, version, 0,
+                                         flag_bits, compress_type, dos_time, dos_date, crc,
+                                         min(compress_size, ZIP64_LIMIT), min(file_size, ZIP64_LIMIT),
+                                         len(encoded_name), len(extra), 0, 0, 0, external_attr,
+                                         min(header_offset, ZIP64_LIMIT)))
+            self.write_bytes(encoded_name + extra)
+
+        count = len(self.entries)
+        directory_size = self.offset - directory_offset
+        if count >= ZIP64_COUNT_LIMIT or directory_size >= ZIP64_LIMIT or directory_offset >= ZIP64_LIMIT:
+            zip64_end_offset = self.offset
+            self.write_bytes(struct.pack("<4sQ2H2L4Q", ZIP64_END_SIGNATURE, 44, ZIP64_VERSION, ZIP64_VERSION,
+                                         0, 0, count, count, directory_size, directory_offset))
+            self.write_bytes(struct.pack("<4sLQL", ZIP64_LOCATOR_SIGNATURE, 0, zip64_end_offset, 1))
+        self.write_bytes(struct.pack("<4s4H2LH", END_SIGNATURE, 0, 0, min(count, ZIP64_COUNT_LIMIT),
+                                     min(count, ZIP64_COUNT_LIMIT), min(directory_size, ZIP64_LIMIT),
+                                     min(directory_offset, ZIP64_LIMIT), 0))
@@ -0,0 +1,92 @@
+import io
+import os
+import hashlib
+import json
+import zipfile
+
+import pytest
+
+from src.load_user_data import deserialize_database
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The two backups shipped with the repository, in the order main.py merges them
+SAMPLE_BACKUPS = [
+    os.path.join(ROOT_DIR, "DiscursoMarioSantana.jwlibrary"),
+    os.path.join(ROOT_DIR, "UserdataBackup_2023-06-16_Redmi_Note_11.jwlibrary"),
+]
+
+# Records of the merge of the two sample backups
+EXPECTED_COUNTS = {
+    "PlaylistItem": 15,
+    "Tag": 2,
+    "TagMap": 15,
+    "IndependentMedia": 19,
+    "Location": 11,
+}
+
+
+@pytest.fixture
+def backups():
+    return list(SAMPLE_BACKUPS)
+
+
+def open_archive(archive):
+    """
+    Load the "userData.db" of a ".jwlibrary" archive (a path or its bytes) into an in-memory connection.
+    """
+    if isinstance(archive, bytes):
+        archive = io.BytesIO(archive)
+    with zipfile.ZipFile(archive, 'r') as zip_ref:
+        return deserialize_database(zip_ref.read("userData.db"))
+
+
+def edited_backup(backup, path, sql, files=None):
+    """
+    Copy a backup to 'path', with 'sql' run on its "userData.db" and the 'files' ({name: bytes}) added to the archive.
+    """
+    conn = open_archive(backup)
+    conn.executescript(sql)
+    database = conn.serialize()
+    conn.close()
+    with zipfile.ZipFile(backup, 'r') as source, zipfile.ZipFile(path, 'w') as target:
+        # The sample backups list "manifest.json" twice; the copy has it once
+        for file_name in dict.fromkeys(source.namelist()):
+            target.writestr(source.getinfo(file_name), database if file_name == "userData.db" else source.read(file_name))
+        for file_name, content in (files or {}).items():
+            target.writestr(file_name, content)
+    return str(path)
+
+
+def table_counts(conn):
+    """
+    Return the number of records of every table of a database, except "LastModified".
+    """
+    tables = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")
+              if name != "LastModified" and not name.startswith("sqlite_")]
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+
+
+def check_archive(archive):
+    """
+    Check that a merged archive is consistent and return the number of records of every table.
+
+    The database must pass the integrity and foreign key checks, the manifest must hold the hash of
+    "userData.db", and every media file the database refers to must be in the archive.
+    """
+    with zipfile.ZipFile(io.BytesIO(archive) if isinstance(archive, bytes) else archive, 'r') as zip_ref:
+        names = set(zip_ref.namelist())
+        manifest = json.loads(zip_ref.read("manifest.json"))
+        database_hash = hashlib.sha256(zip_ref.read("userData.db")).hexdigest()
+
+    conn = open_archive(archive)
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+        assert manifest["userDataBackup"]["hash"] == database_hash
+        assert manifest["userDataBackup"]["schemaVersion"] == conn.execute("PRAGMA user_version").fetchone()[0]
+        media_files = {file_path for (file_path,) in conn.execute("SELECT FilePath FROM IndependentMedia")}
+        assert media_files <= names
+        return table_counts(conn)
+    finally:
+        conn.close()
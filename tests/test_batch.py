@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+import main
+from src.batch import load_batch_manifest
+from conftest import EXPECTED_COUNTS, check_archive
+
+
+@pytest.fixture
+def batch_dir(backups, tmp_path):
+    for backup in backups:
+        shutil.copy(backup, tmp_path)
+    return tmp_path
+
+
+def run_batch_main(monkeypatch, manifest, *options):
+    monkeypatch.setattr(sys, "argv", ["main.py", "--batch", str(manifest), *options])
+    main.main()
+
+
+def test_manifests_resolve_paths_against_their_folder(batch_dir, tmp_path, monkeypatch):
+    first, second = sorted(name for name in os.listdir(batch_dir) if name.endswith(".jwlibrary"))
+    # Rows with the same output add to the same group
+    (batch_dir / "groups.csv").write_text(f"# output,inputs\nboth.jwlibrary,{first}\n"
+                                          f"both.jwlibrary,{second}\nout/one.jwlibrary,{first}\n")
+    (batch_dir / "groups.json").write_text(json.dumps({"one.jwlibrary": first, "both.jwlibrary": [first, second]}))
+    monkeypatch.chdir(tmp_path.parent)
+
+    assert load_batch_manifest(str(batch_dir / "groups.csv")) == [
+        (str(batch_dir / "both.jwlibrary"), [str(batch_dir / first), str(batch_dir / second)]),
+        (str(batch_dir / "out/one.jwlibrary"), [str(batch_dir / first)]),
+    ]
+    assert load_batch_manifest(str(batch_dir / "groups.json")) == [
+        (str(batch_dir / "one.jwlibrary"), [str(batch_dir / first)]),
+        (str(batch_dir / "both.jwlibrary"), [str(batch_dir / first), str(batch_dir / second)]),
+    ]
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_batch_merges_every_group(batch_dir, monkeypatch, workers):
+    first, second = sorted(name for name in os.listdir(batch_dir) if name.endswith(".jwlibrary"))
+    manifest = batch_dir / "groups.json"
+    manifest.write_text(json.dumps({"one.jwlibrary": [first], "out/both.jwlibrary": [first, second]}))
+
+    run_batch_main(monkeypatch, manifest, "--workers", workers)
+
+    counts = check_archive(str(batch_dir / "out" / "both.jwlibrary"))
+    assert {table: counts[table] for table in EXPECTED_COUNTS} == EXPECTED_COUNTS
+    assert check_archive(str(batch_dir / "one.jwlibrary"))["PlaylistItem"] < EXPECTED_COUNTS["PlaylistItem"]
+
+
+def test_failed_group_sets_the_exit_status(batch_dir, monkeypatch, capsys):
+    first, second = sorted(name for name in os.listdir(batch_dir) if name.endswith(".jwlibrary"))
+    (batch_dir / "broken.jwlibrary").write_bytes(b"not a zip file")
+    manifest = batch_dir / "groups.json"
+    manifest.write_text(json.dumps({"broken_group.jwlibrary": ["broken.jwlibrary"], "both.jwlibrary": [first, second]}))
+
+    with pytest.raises(SystemExit) as exit_info:
+        run_batch_main(monkeypatch, manifest, "--workers", "1")
+
+    assert exit_info.value.code == 1
+    output = capsys.readouterr().out
+    assert f"Group '{batch_dir / 'broken_group.jwlibrary'}' failed" in output
+    assert "1 of 2 groups merged successfully." in output
+    # The failed group does not stop the others
+    counts = check_archive(str(batch_dir / "both.jwlibrary"))
+    assert {table: counts[table] for table in EXPECTED_COUNTS} == EXPECTED_COUNTS
+    assert not (batch_dir / "broken_group.jwlibrary").exists()
@@ -0,0 +1,53 @@
+import os
+import zipfile
+
+import pytest
+
+from src.ingest import ingest_archive, ingest_archives, open_snapshots
+
+
+def broken_archives(tmp_path):
+    """
+    Build a file that is not a ZIP archive and an archive without "userData.db".
+    """
+    not_zip = tmp_path / "not_zip.jwlibrary"
+    not_zip.write_bytes(b"not a zip file")
+    no_database = tmp_path / "no_database.jwlibrary"
+    with zipfile.ZipFile(no_database, 'w') as zip_file:
+        zip_file.writestr("manifest.json", b"{}")
+    return str(not_zip), str(no_database)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_ingest_keeps_the_order_and_skips_invalid_archives(backups, tmp_path, capsys, workers):
+    not_zip, no_database = broken_archives(tmp_path)
+    first, second = backups
+    snapshots = ingest_archives([second, not_zip, first, no_database], workers)
+
+    # The snapshots come back in the order of the files, whichever worker finishes first
+    assert [snapshot.file_path for snapshot in snapshots] == [second, first]
+    output = capsys.readouterr().out
+    assert f"Skipping {not_zip}" in output
+    assert f"Skipping {no_database}: '{no_database}' has no userData.db" in output
+
+    sources = open_snapshots(snapshots)
+    assert all(snapshot.data is None for snapshot in snapshots)
+    for (name, conn), backup in zip(sources, [second, first]):
+        assert name == os.path.basename(backup)
+        assert conn.execute("PRAGMA quick_check").fetchone()[0] == "ok"
+        assert conn.execute("SELECT COUNT(*) FROM PlaylistItem").fetchone()[0] > 0
+        conn.close()
+
+
+def test_ingest_rejects_a_damaged_database(tmp_path):
+    archive = tmp_path / "damaged.jwlibrary"
+    with zipfile.ZipFile(archive, 'w') as zip_file:
+        zip_file.writestr("userData.db", b"SQLite format 3\x00" + b"\x00" * 100)
+    with pytest.raises(ValueError, match="damaged|not a valid database"):
+        ingest_archive(str(archive))
+
+
+def test_ingested_database_has_no_wal(backups):
+    snapshot = ingest_archive(backups[0])
+    # The header of a rollback journal database has version 1 for reads and writes, WAL has 2
+    assert snapshot.data[18:20] == b"\x01\x01"
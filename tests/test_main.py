@@ -0,0 +1,65 @@
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+import main
+from conftest import EXPECTED_COUNTS, check_archive
+
+# Command line options of every merge engine
+ENGINES = {
+    "rows": [],
+    "attach": ["--attach"],
+    "in-memory": ["--in-memory"],
+    "attach-in-memory": ["--in-memory", "--attach"],
+}
+
+
+def run_main(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["main.py", *args])
+    main.main()
+
+
+@pytest.fixture
+def merged_archives(backups, tmp_path, monkeypatch):
+    # Run from an empty folder, so nothing is read from or written to the folder of the program
+    monkeypatch.chdir(tmp_path)
+    # The scratch folders of the merge are created here, to check that they are removed
+    scratch_dir = tmp_path / "scratch"
+    scratch_dir.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(scratch_dir))
+    archives = {}
+    for engine, options in ENGINES.items():
+        archives[engine] = str(tmp_path / f"{engine}.jwlibrary")
+        run_main(monkeypatch, *backups, "--output", archives[engine], *options)
+    return archives
+
+
+def test_engines_merge_the_same_records(merged_archives, tmp_path):
+    counts = {engine: check_archive(archive) for engine, archive in merged_archives.items()}
+
+    assert {table: counts["rows"][table] for table in EXPECTED_COUNTS} == EXPECTED_COUNTS
+    for engine in ENGINES:
+        assert counts[engine] == counts["rows"], engine
+    # No "DB" or "merged" folder is left, neither in the current folder nor in the temporary one
+    assert [entry.name for entry in os.scandir(tmp_path) if entry.is_dir()] == ["scratch"]
+    assert os.listdir(tmp_path / "scratch") == []
+
+
+def test_backups_are_found_in_the_given_folder(backups, tmp_path, monkeypatch):
+    backup_dir = tmp_path / "backups"
+    backup_dir.mkdir()
+    for backup in backups:
+        shutil.copy(backup, backup_dir)
+    monkeypatch.chdir(tmp_path)
+
+    run_main(monkeypatch, str(backup_dir))
+
+    counts = check_archive(str(tmp_path / main.MERGED_ARCHIVE))
+    assert {table: counts[table] for table in EXPECTED_COUNTS} == EXPECTED_COUNTS
+    # The merged archive is written to the current folder, and is never merged again
+    copies = [str(backup_dir / os.path.basename(backup)) for backup in backups]
+    assert main.find_jwlibrary_files([str(backup_dir), str(tmp_path)], main.MERGED_ARCHIVE) == copies
+    assert main.find_jwlibrary_files([str(tmp_path)], "other.jwlibrary") == []
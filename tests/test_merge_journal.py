@@ -0,0 +1,88 @@
+import os
+import sys
+
+import pytest
+
+import main
+from main import merge_in_memory
+from src.batch import run_batch
+from src.merge_journal import file_sha256, journal_path_for, load_journal
+from conftest import EXPECTED_COUNTS, check_archive, open_archive
+
+
+def table_rows(archive):
+    """
+    Return the sorted records of every table of a merged archive, except "LastModified".
+    """
+    conn = open_archive(archive)
+    try:
+        tables = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")
+                  if name != "LastModified" and not name.startswith("sqlite_")]
+        return {table: sorted(conn.execute(f"SELECT * FROM {table}").fetchall(), key=repr) for table in tables}
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("attach", [False, True])
+def test_incremental_merge_equals_full_merge(backups, tmp_path, capsys, attach):
+    first, second = backups
+    full = str(tmp_path / "full.jwlibrary")
+    incremental = str(tmp_path / "incremental.jwlibrary")
+    merge_in_memory(backups, full, attach, workers=1)
+
+    # Merge A, then A + B into the same archive: only B is merged the second time
+    merge_in_memory([first], incremental, attach, workers=1, incremental=True)
+    capsys.readouterr()
+    merge_in_memory(backups, incremental, attach, workers=1, incremental=True)
+    output = capsys.readouterr().out
+    assert "DiscursoMarioSantana.jwlibrary was already merged. Skipping..." in output
+    assert output.count("DiscursoMarioSantana.jwlibrary") == 1
+
+    journal = load_journal(journal_path_for(incremental))
+    assert [source["sha256"] for source in journal["sources"]] == [file_sha256(first), file_sha256(second)]
+    assert check_archive(incremental) == check_archive(full)
+    assert table_rows(incremental) == table_rows(full)
+
+    # Every backup is in the journal now, so the archive is left as it is
+    with open(incremental, "rb") as archive_file:
+        merged = archive_file.read()
+    merge_in_memory(backups, incremental, attach, workers=1, incremental=True)
+    assert "No new backups to merge." in capsys.readouterr().out
+    with open(incremental, "rb") as archive_file:
+        assert archive_file.read() == merged
+    assert len(load_journal(journal_path_for(incremental))["sources"]) == 2
+
+
+def rewrite_with_folder_mode(output, backup, monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["main.py", backup, "--output", output])
+    main.main()
+
+
+def rewrite_with_selection(output, backup, monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["main.py", backup, "--output", output, "--in-memory", "--label", "*"])
+    main.main()
+
+
+def rewrite_with_batch(output, backup, monkeypatch):
+    run_batch([(output, [backup])], workers=1)
+
+
+@pytest.mark.parametrize("rewrite", [rewrite_with_folder_mode, rewrite_with_selection, rewrite_with_batch])
+def test_archive_rewritten_without_journal_is_merged_again(backups, tmp_path, monkeypatch, rewrite):
+    first, _ = backups
+    output = str(tmp_path / "merged.jwlibrary")
+    monkeypatch.chdir(tmp_path)
+
+    merge_in_memory(backups, output, workers=1)
+    assert os.path.exists(journal_path_for(output))
+
+    # The archive now holds only the first backup, so the journal of both is removed
+    rewrite(output, first, monkeypatch)
+    assert not os.path.exists(journal_path_for(output))
+    assert check_archive(output)["PlaylistItem"] < EXPECTED_COUNTS["PlaylistItem"]
+
+    # Without the journal, nothing is skipped and the items of the second backup are back
+    merge_in_memory(backups, output, workers=1, incremental=True)
+    counts = check_archive(output)
+    assert {table: counts[table] for table in EXPECTED_COUNTS} == EXPECTED_COUNTS
+    assert len(load_journal(journal_path_for(output))["sources"]) == 2
@@ -0,0 +1,54 @@
+import os
+import sys
+import zipfile
+
+import pytest
+
+import main
+from main import merge_in_memory
+from src.merge_planner import plan_merge, print_merge_plan
+from src.select_playlist_items import PlaylistSelection
+from src.template_schema import template_schema
+from conftest import EXPECTED_COUNTS, check_archive
+
+
+@pytest.mark.parametrize("selection", [None, PlaylistSelection((), ("Hebreus*", "IMG-*"))])
+def test_plan_matches_the_merge(backups, tmp_path, selection):
+    plan = plan_merge(backups, selection)
+    output = str(tmp_path / "merged.jwlibrary")
+    merge_in_memory(backups, output, workers=1, selection=selection)
+    counts = check_archive(output)
+
+    # Every table is planned with the records the merge writes, after the prune, besides the rows of the template
+    seed_rows = template_schema().seed_rows
+    assert {table: stats["written"] for table, stats in plan["tables"].items()} == \
+        {table: counts[table] - len(seed_rows.get(table, ())) for table in plan["tables"]}
+    for stats in plan["tables"].values():
+        assert stats["read"] == stats["written"] + stats["collisions"] + stats["orphans"] + stats["pruned"]
+
+    with zipfile.ZipFile(output) as zip_ref:
+        media_members = [name for name in zip_ref.namelist() if name not in ("userData.db", "manifest.json")]
+    assert plan["media"]["files"] == counts["IndependentMedia"]
+    assert plan["media"]["files"] <= len(media_members)
+    assert abs(plan["estimated_output_bytes"] - os.path.getsize(output)) < 0.25 * os.path.getsize(output)
+
+
+def test_plan_option_writes_nothing(backups, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["main.py", *backups, "--plan"])
+    main.main()
+
+    output = capsys.readouterr().out
+    assert os.listdir(tmp_path) == []
+    assert f"{'PlaylistItem':<34}" in output
+    assert "Estimated merged archive:" in output
+
+
+def test_print_merge_plan(backups, capsys):
+    plan = plan_merge(backups)
+    print_merge_plan(plan)
+    lines = capsys.readouterr().out.splitlines()
+
+    assert lines[0].startswith("DiscursoMarioSantana.jwlibrary: ")
+    row = next(line for line in lines if line.startswith("PlaylistItem "))
+    assert row.split()[2] == str(EXPECTED_COUNTS["PlaylistItem"])
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import http.client
+
+import pytest
+
+from src.merge_server import MergeJob, create_server
+from conftest import EXPECTED_COUNTS, check_archive
+
+BOUNDARY = "jwlibrary-merger-test-boundary"
+
+
+def multipart_body(files):
+    """
+    Build a multipart/form-data body with a file field for every (file name, content) pair.
+    """
+    body = b""
+    for index, (file_name, content) in enumerate(files):
+        body += (f"--{BOUNDARY}\r\n"
+                 f'Content-Disposition: form-data; name="backup{index}"; filename="{file_name}"\r\n'
+                 "Content-Type: application/octet-stream\r\n\r\n").encode("utf-8") + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode("utf-8")
+
+
+def request(server, method, path, files=None):
+    """
+    Send a request to the server and return its status, headers and body.
+    """
+    host, port = server.server_address[:2]
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        if files is None:
+            conn.request(method, path)
+        else:
+            conn.request(method, path, body=multipart_body(files),
+                         headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(**options):
+        # Port 0 picks a free port
+        server = create_server(port=0, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+        server.service.stop()
+
+
+def read_backups(backups):
+    files = []
+    for backup in backups:
+        with open(backup, "rb") as backup_file:
+            files.append((os.path.basename(backup), backup_file.read()))
+    return files
+
+
+def test_merge_round_trip(serve, backups):
+    server = serve(workers=1)
+
+    status, headers, body = request(server, "POST", "/merge", read_backups(backups))
+    assert status == 200
+    assert headers["Content-Type"] == "application/octet-stream"
+    assert headers["X-Job-Id"] == "1"
+    counts = check_archive(body)
+    assert {table: counts[table] for table in EXPECTED_COUNTS} == EXPECTED_COUNTS
+
+    # No valid backup in the request
+    status, _, body = request(server, "POST", "/merge", [("broken.jwlibrary", b"not a zip file")])
+    assert status == 422
+    assert json.loads(body)["job"] == 2
+
+    status, _, body = request(server, "GET", "/stats")
+    assert status == 200
+    stats = json.loads(body)
+    assert stats["accepted"] == 2
+    assert stats["completed"] == 1
+    assert stats["failed"] == 1
+    assert stats["rejected"] == 0
+    assert stats["queue_depth"] == 0
+    assert [job["status"] for job in stats["recent_jobs"]] == ["completed", "failed"]
+    assert stats["latency_seconds"]["max"] > 0
+
+
+def test_full_queue_rejects_merges(serve, backups):
+    # Without workers, a queued job is never taken, so the queue stays full
+    server = serve(workers=0, queue_size=1)
+    server.service.jobs.put_nowait(MergeJob(0, []))
+
+    status, _, body = request(server, "POST", "/merge", read_backups(backups))
+    assert status == 503
+    assert "queue is full" in json.loads(body)["error"]
+
+    status, _, body = request(server, "GET", "/stats")
+    stats = json.loads(body)
+    assert stats["rejected"] == 1
+    assert stats["queue_depth"] == 1
+
+
+def test_invalid_requests(serve):
+    server = serve(workers=1)
+
+    assert request(server, "GET", "/unknown")[0] == 404
+    assert request(server, "POST", "/merge")[0] == 400
+    assert request(server, "POST", "/merge", [])[0] == 400
@@ -0,0 +1,62 @@
+import pytest
+
+from src.merger import Merger
+from conftest import check_archive, edited_backup, open_archive
+
+LOCATIONS = """
+INSERT INTO Location (LocationId, DocumentId, KeySymbol, MepsLanguage, Type) VALUES ({}, {}, 'w', 0, 0);
+"""
+
+# A note with a highlight, a bookmark and an input field
+FIRST_SQL = LOCATIONS.format(900, 1001) + LOCATIONS.format(901, 1002) + """
+INSERT INTO UserMark VALUES (1, 1, 900, 0, 'mark-shared', 1);
+INSERT INTO BlockRange VALUES (1, 1, 5, 0, 10, 1);
+INSERT INTO Note (NoteId, Guid, UserMarkId, LocationId, Content) VALUES (1, 'note-shared', 1, 900, 'First');
+INSERT INTO Bookmark (BookmarkId, LocationId, PublicationLocationId, Slot, Title) VALUES (1, 900, 901, 0, 'First');
+INSERT INTO InputField VALUES (900, 'tt1', 'first');
+"""
+
+# The same note and highlight under other IDs, and new ones whose IDs are taken in the first backup
+SECOND_SQL = LOCATIONS.format(700, 1002) + LOCATIONS.format(701, 1001) + LOCATIONS.format(702, 1003) + """
+INSERT INTO UserMark VALUES (1, 2, 702, 0, 'mark-other', 1);
+INSERT INTO UserMark VALUES (2, 1, 701, 0, 'mark-shared', 1);
+INSERT INTO BlockRange VALUES (1, 1, 3, 0, 4, 1);
+INSERT INTO BlockRange VALUES (2, 1, 5, 0, 10, 2);
+INSERT INTO Note (NoteId, Guid, UserMarkId, LocationId, Content) VALUES (1, 'note-other', 1, 702, 'Other');
+INSERT INTO Note (NoteId, Guid, UserMarkId, LocationId, Content) VALUES (2, 'note-shared', 2, 701, 'Second');
+INSERT INTO Bookmark (BookmarkId, LocationId, PublicationLocationId, Slot, Title) VALUES (1, 702, 700, 1, 'Other');
+INSERT INTO InputField VALUES (701, 'tt1', 'second');
+INSERT INTO InputField VALUES (702, 'tt1', 'other');
+"""
+
+
+@pytest.mark.parametrize("attach", [False, True])
+def test_notes_and_highlights_are_remapped(backups, tmp_path, attach):
+    first, second = backups
+    edited = [edited_backup(first, tmp_path / "first.jwlibrary", FIRST_SQL),
+              edited_backup(second, tmp_path / "second.jwlibrary", SECOND_SQL)]
+    with Merger(attach) as merger:
+        data = merger.merge(edited)
+
+    counts = check_archive(data)
+    assert [counts[table] for table in ("Note", "UserMark", "BlockRange", "Bookmark", "InputField")] == [2] * 5
+
+    # Every reference is followed by GUID and location, not by ID: the shared note, mark and range are
+    # merged once and keep the content of the first backup, and the new ones point to their own records
+    conn = open_archive(data)
+    notes = conn.execute(
+        "SELECT n.Guid, n.Content, m.UserMarkGuid, l.DocumentId FROM Note n"
+        " JOIN UserMark m ON m.UserMarkId = n.UserMarkId JOIN Location l ON l.LocationId = n.LocationId ORDER BY n.Guid")
+    assert notes.fetchall() == [("note-other", "Other", "mark-other", 1003), ("note-shared", "First", "mark-shared", 1001)]
+    ranges = conn.execute(
+        "SELECT m.UserMarkGuid, l.DocumentId, r.Identifier, r.StartToken, r.EndToken FROM BlockRange r"
+        " JOIN UserMark m ON m.UserMarkId = r.UserMarkId JOIN Location l ON l.LocationId = m.LocationId ORDER BY 1")
+    assert ranges.fetchall() == [("mark-other", 1003, 3, 0, 4), ("mark-shared", 1001, 5, 0, 10)]
+    bookmarks = conn.execute(
+        "SELECT l.DocumentId, p.DocumentId, b.Slot, b.Title FROM Bookmark b JOIN Location l ON l.LocationId = b.LocationId"
+        " JOIN Location p ON p.LocationId = b.PublicationLocationId ORDER BY b.Slot")
+    assert bookmarks.fetchall() == [(1001, 1002, 0, "First"), (1003, 1002, 1, "Other")]
+    fields = conn.execute(
+        "SELECT l.DocumentId, f.TextTag, f.Value FROM InputField f JOIN Location l ON l.LocationId = f.LocationId ORDER BY 1")
+    assert fields.fetchall() == [(1001, "tt1", "first"), (1003, "tt1", "other")]
+    conn.close()
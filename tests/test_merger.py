@@ -0,0 +1,65 @@
+import io
+
+import pytest
+
+import src.merger
+from src.merger import Merger
+from src.prune_unreachable import prune_unreachable
+from src.template_schema import template_schema
+from conftest import EXPECTED_COUNTS, check_archive, open_archive
+
+
+@pytest.mark.parametrize("attach", [False, True])
+def test_merge_sample_backups(backups, attach):
+    with Merger(attach) as merger:
+        data = merger.merge(backups)
+
+    counts = check_archive(data)
+    assert {table: counts[table] for table in EXPECTED_COUNTS} == EXPECTED_COUNTS
+
+
+def test_merge_writes_output_file(backups, tmp_path):
+    output = tmp_path / "merged.jwlibrary"
+    with Merger() as merger:
+        assert merger.merge(backups, str(output)) is None
+        # The same Merger can merge again, from file objects
+        with open(backups[0], "rb") as first, open(backups[1], "rb") as second:
+            data = merger.merge([first, second])
+
+    assert check_archive(str(output)) == check_archive(data)
+
+
+def test_merge_leaves_out_invalid_backups(backups):
+    upload = io.BytesIO(b"not a zip file")
+    upload.name = "broken.jwlibrary"
+    with Merger() as merger:
+        counts = check_archive(merger.merge([upload] + backups))
+        with pytest.raises(ValueError):
+            merger.merge([upload])
+
+    assert {table: counts[table] for table in EXPECTED_COUNTS} == EXPECTED_COUNTS
+
+
+@pytest.mark.parametrize("attach", [False, True])
+def test_triggers_are_dropped_for_the_merge(backups, monkeypatch, attach):
+    triggers_during_merge = []
+
+    def prune(merged_conn):
+        triggers_during_merge.extend(merged_conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'"))
+        return prune_unreachable(merged_conn)
+
+    monkeypatch.setattr(src.merger, "prune_unreachable", prune)
+    with Merger(attach) as merger:
+        data = merger.merge(backups)
+
+    assert triggers_during_merge == []
+    conn = open_archive(data)
+    triggers = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    assert triggers == {name for kind, name, _ in template_schema().ddl if kind == "trigger"}
+    # The merged archive is stamped once, and the triggers update the stamp on the next change
+    (last_modified,) = conn.execute("SELECT LastModified FROM LastModified").fetchone()
+    assert last_modified != template_schema().seed_rows["LastModified"][0][0]
+    conn.execute("UPDATE LastModified SET LastModified = ''")
+    conn.execute("DELETE FROM TagMap WHERE TagMapId = (SELECT MIN(TagMapId) FROM TagMap)")
+    assert conn.execute("SELECT LastModified FROM LastModified").fetchone()[0] != ""
+    conn.close()
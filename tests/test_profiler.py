@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+
+import pytest
+
+import main
+from conftest import EXPECTED_COUNTS
+
+
+def merge_with_report(backups, tmp_path, monkeypatch, *options):
+    monkeypatch.chdir(tmp_path)
+    output = str(tmp_path / "merged.jwlibrary")
+    report_path = str(tmp_path / "report.json")
+    monkeypatch.setattr(sys, "argv", ["main.py", *backups, "--output", output, "--report", report_path, *options])
+    main.main()
+    with open(report_path, 'r', encoding='utf-8') as report_file:
+        report = json.load(report_file)
+    return output, {stage["stage"]: stage for stage in report["stages"]}, report
+
+
+@pytest.mark.parametrize("options, top_stages, write_stage", [
+    (["--in-memory"], ["find", "hash", "ingest", "load", "merge", "write"], "write"),
+    ([], ["find", "extract", "template", "merge", "extract media", "zip", "cleanup"], "zip"),
+])
+def test_report_has_every_stage_and_table(backups, tmp_path, monkeypatch, options, top_stages, write_stage):
+    output, stages, report = merge_with_report(backups, tmp_path, monkeypatch, *options)
+
+    assert len(stages) == len(report["stages"]), "stage names must be unique"
+    assert [name for name in stages if "/" not in name] == top_stages
+    assert report["total_wall_time"] >= stages["merge"]["wall_time"] > 0
+
+    # Every table is merged once per backup, and the steps after the merge have their own stages
+    tables = {name: stage for name, stage in stages.items() if name.startswith("merge/") and name.count("/") == 1}
+    for name in ["prune", "LastModified", "seed PlaylistItemAccuracy", "commit"]:
+        assert tables.pop(f"merge/{name}")["calls"] == 1
+    assert all(stage["calls"] == len(backups) for stage in tables.values())
+    for table in EXPECTED_COUNTS:
+        stage = tables[f"merge/{table}"]
+        assert stage["rows_read"] == stage["rows_written"] + stage["collisions"]
+    assert tables["merge/PlaylistItem"]["rows_written"] == EXPECTED_COUNTS["PlaylistItem"]
+    assert stages[write_stage]["bytes_out"] == os.path.getsize(output)
+
+
+def test_profile_dir_writes_a_profile_per_stage(backups, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    profile_dir = tmp_path / "profiles"
+    monkeypatch.setattr(sys, "argv", ["main.py", *backups, "--in-memory", "--profile-dir", str(profile_dir)])
+    main.main()
+
+    assert (profile_dir / "merge_report.json").exists()
+    assert {"merge.prof", "write.prof", "ingest.prof"} <= set(os.listdir(profile_dir))
@@ -0,0 +1,74 @@
+import sys
+import zipfile
+
+import pytest
+
+import main
+from src.ingest import ingest_archives, open_snapshots
+from src.merger import merge_sources
+from src.prune_unreachable import prune_unreachable
+from src.template_schema import template_schema
+from conftest import EXPECTED_COUNTS, check_archive, edited_backup, open_archive
+
+# A location a note refers to, and a location and a media file nothing refers to
+UNREACHABLE_SQL = """
+INSERT INTO Location (LocationId, DocumentId, KeySymbol, MepsLanguage, Type, Title) VALUES (900, 1, 'kept', 0, 0, 'Kept');
+INSERT INTO Location (LocationId, DocumentId, KeySymbol, MepsLanguage, Type, Title) VALUES (901, 2, 'orphan', 0, 0, 'Orphan');
+INSERT INTO Note (Guid, LocationId, Title, Content, LastModified, Created, BlockType)
+    VALUES ('d3c7b0a2-0000-4000-8000-000000000001', 900, 'Note', 'Text', '2024-01-01T00:00:00+00:00',
+            '2024-01-01T00:00:00+00:00', 0);
+INSERT INTO IndependentMedia (OriginalFilename, FilePath, MimeType, Hash)
+    VALUES ('orphan.jpg', 'orphan.jpg', 'image/jpeg', 'orphanhash');
+"""
+
+
+@pytest.fixture
+def unreachable_backups(backups, tmp_path):
+    first, second = backups
+    return [edited_backup(first, tmp_path / "unreachable.jwlibrary", UNREACHABLE_SQL, {"orphan.jpg": b"\xff\xd8orphan"}),
+            second]
+
+
+def test_prune_counts_the_removed_records():
+    merged_conn = template_schema().instantiate()
+    merged_conn.executescript(UNREACHABLE_SQL)
+
+    assert prune_unreachable(merged_conn) == {"IndependentMedia": 1, "Location": 1}
+    assert [key for (key,) in merged_conn.execute("SELECT KeySymbol FROM Location")] == ["kept"]
+    assert merged_conn.execute("SELECT COUNT(*) FROM IndependentMedia").fetchone()[0] == 0
+    # Nothing is left to remove
+    assert prune_unreachable(merged_conn) == {"IndependentMedia": 0, "Location": 0}
+
+
+@pytest.mark.parametrize("attach", [False, True])
+def test_unreachable_media_file_is_skipped(unreachable_backups, capsys, attach):
+    sources = open_snapshots(ingest_archives(unreachable_backups, workers=1))
+    merged_conn = template_schema().instantiate()
+    skipped_files = merge_sources(sources, merged_conn, attach)
+
+    output = capsys.readouterr().out
+    # The sample backups already have 7 locations nothing refers to
+    assert "'Location' table: 8 records no other record refers to were removed." in output
+    assert "'IndependentMedia' table: 1 records no other record refers to were removed." in output
+    # The media file of the pruned record is never read from its archive
+    assert "orphan.jpg" in skipped_files
+    counts = {table: merged_conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in EXPECTED_COUNTS}
+    assert counts == dict(EXPECTED_COUNTS, Location=EXPECTED_COUNTS["Location"] + 1)
+    merged_conn.close()
+
+
+@pytest.mark.parametrize("mode", [[], ["--in-memory"]])
+def test_unreachable_media_file_is_not_written(unreachable_backups, tmp_path, monkeypatch, mode):
+    monkeypatch.chdir(tmp_path)
+    output = str(tmp_path / "merged.jwlibrary")
+    monkeypatch.setattr(sys, "argv", ["main.py", *unreachable_backups, *mode, "--output", output])
+    main.main()
+
+    counts = check_archive(output)
+    assert counts["IndependentMedia"] == EXPECTED_COUNTS["IndependentMedia"]
+    assert counts["Note"] == 1
+    with zipfile.ZipFile(output) as zip_ref:
+        assert "orphan.jpg" not in zip_ref.namelist()
+    conn = open_archive(output)
+    assert conn.execute("SELECT COUNT(*) FROM Location WHERE KeySymbol = 'orphan'").fetchone()[0] == 0
+    conn.close()
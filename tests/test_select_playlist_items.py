@@ -0,0 +1,69 @@
+import os
+import sys
+import zipfile
+
+import pytest
+
+import main
+from src.merge_journal import journal_path_for
+from conftest import check_archive, open_archive
+
+
+def run_main(monkeypatch, tmp_path, *args):
+    monkeypatch.chdir(tmp_path)
+    output = str(tmp_path / "merged.jwlibrary")
+    monkeypatch.setattr(sys, "argv", ["main.py", *args, "--output", output])
+    main.main()
+    return output
+
+
+def media_members(archive, backups):
+    """
+    Return the members of an archive that are media files of a source database.
+    """
+    media_files = set()
+    for backup in backups:
+        conn = open_archive(backup)
+        media_files.update(file_path for (file_path,) in conn.execute("SELECT FilePath FROM IndependentMedia"))
+        conn.close()
+    with zipfile.ZipFile(archive) as zip_ref:
+        return set(zip_ref.namelist()) & media_files
+
+
+@pytest.mark.parametrize("mode", [[], ["--in-memory"]])
+@pytest.mark.parametrize("options, labels, locations", [
+    # Tags and labels are shell patterns compared without regard to case
+    (["--tag", "discurso*2"], ["Imagem 1", "texto 2", "vídeo externa 3"], 1),
+    (["--label", "hebreus*"], ["Hebreus 12:2", "Hebreus 10:32-34", "Hebreus 6:10"], 3),
+    # With both, an item must match both
+    (["--tag", "Discurso*2", "--label", "Imagem*"], ["Imagem 1"], 0),
+])
+def test_only_the_selected_items_are_merged(backups, tmp_path, monkeypatch, mode, options, labels, locations):
+    output = run_main(monkeypatch, tmp_path, *backups, *mode, *options)
+
+    counts = check_archive(output)
+    conn = open_archive(output)
+    assert sorted(label for (label,) in conn.execute("SELECT Label FROM PlaylistItem")) == sorted(labels)
+    assert counts["TagMap"] == len(labels)
+    assert counts["Location"] == locations
+    # Only the media files of the selected items are read and written
+    media_files = {file_path for (file_path,) in conn.execute("SELECT FilePath FROM IndependentMedia")}
+    conn.close()
+    assert media_members(output, backups) == media_files
+    # The archive does not hold every record of the backups, so it has no journal
+    assert not os.path.exists(journal_path_for(output))
+
+
+def test_source_patterns_choose_the_backups(backups, tmp_path, monkeypatch, capsys):
+    output = run_main(monkeypatch, tmp_path, *backups, "--in-memory", "--source", "discurso*")
+    assert "1 backups match discurso*." in capsys.readouterr().out
+
+    counts = check_archive(output)
+    assert (counts["PlaylistItem"], counts["IndependentMedia"]) == (12, 14)
+    assert media_members(output, backups) == media_members(output, backups[:1])
+    assert os.path.exists(journal_path_for(output))
+
+
+def test_selection_cannot_be_incremental(backups, tmp_path, monkeypatch):
+    with pytest.raises(SystemExit):
+        run_main(monkeypatch, tmp_path, *backups, "--incremental", "--tag", "*")
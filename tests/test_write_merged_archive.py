@@ -0,0 +1,104 @@
+import io
+import sqlite3
+import zipfile
+
+from src.template_schema import template_schema
+from src.zip_merged_folder import zip_merged_folder
+from src.write_merged_archive import write_merged_archive
+from src.zip_record_writer import ZipRecordWriter
+from conftest import check_archive
+
+TEXT = b"Compressible content of a media file. " * 2000
+JPEG = b"\xff\xd8\xff\xe0" + bytes(range(256)) * 40
+
+
+def source_archive():
+    """
+    Build a source backup with a stored, a deflated and a bzip2 media member.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zip_file:
+        zip_file.writestr("userData.db", b"not read")
+        zip_file.writestr("manifest.json", b"{}")
+        zip_file.writestr("photo.jpg", JPEG, compress_type=zipfile.ZIP_STORED)
+        zip_file.writestr("notes.txt", TEXT, compress_type=zipfile.ZIP_DEFLATED, compresslevel=9)
+        zip_file.writestr("legacy.txt", TEXT, compress_type=zipfile.ZIP_BZIP2)
+    buffer.seek(0)
+    return buffer
+
+
+def test_media_members_are_copied_raw(tmp_path):
+    source = source_archive()
+    with zipfile.ZipFile(source) as zip_ref:
+        source_infos = {info.filename: info for info in zip_ref.infolist()}
+    source.seek(0)
+
+    merged_conn = sqlite3.connect(":memory:")
+    template_schema().instantiate(merged_conn)
+    output = tmp_path / "merged.jwlibrary"
+    write_merged_archive(merged_conn, [source], str(output))
+    merged_conn.close()
+
+    check_archive(str(output))
+    with zipfile.ZipFile(output) as zip_ref:
+        assert zip_ref.testzip() is None
+        assert zip_ref.namelist() == ["userData.db", "manifest.json", "photo.jpg", "notes.txt", "legacy.txt"]
+        infos = {info.filename: info for info in zip_ref.infolist()}
+        # Stored and deflated members keep the compressed bytes of the source, level 9 included
+        for name in ("photo.jpg", "notes.txt"):
+            assert (infos[name].compress_type, infos[name].compress_size, infos[name].CRC) == \
+                (source_infos[name].compress_type, source_infos[name].compress_size, source_infos[name].CRC)
+        # Other methods are recompressed
+        assert infos["legacy.txt"].compress_type == zipfile.ZIP_DEFLATED
+        assert zip_ref.read("legacy.txt") == TEXT
+        assert zip_ref.read("notes.txt") == TEXT
+    assert not (tmp_path / "merged.jwlibrary.tmp").exists()
+
+
+def test_record_writer_zip64_directory():
+    buffer = io.BytesIO()
+    with ZipRecordWriter(buffer) as writer:
+        # More members than the end of central directory record can count
+        for index in range(0x10000):
+            writer.write_member(f"{index}.txt", (2024, 1, 1, 0, 0, 0), zipfile.ZIP_STORED, [str(index).encode()])
+        writer.write_member("Canção.txt", (1970, 1, 1, 0, 0, 0), zipfile.ZIP_STORED, [TEXT])
+
+    with zipfile.ZipFile(buffer) as zip_ref:
+        assert len(zip_ref.infolist()) == 0x10001
+        assert zip_ref.read("65535.txt") == b"65535"
+        assert zip_ref.read("Canção.txt") == TEXT
+        # The MS-DOS date starts in 1980
+        assert zip_ref.getinfo("Canção.txt").date_time == (1980, 1, 1, 0, 0, 0)
+
+
+def test_folder_members_are_deflated_in_parallel_in_order(tmp_path):
+    merged_dir = tmp_path / "merged"
+    merged_dir.mkdir()
+    merged_conn = sqlite3.connect(merged_dir / "userData.db")
+    template_schema().instantiate(merged_conn)
+    merged_conn.close()
+    for index in range(12):
+        (merged_dir / f"text{index}.txt").write_bytes(TEXT * (index + 1))
+        (merged_dir / f"photo{index}.jpg").write_bytes(JPEG)
+
+    archives = []
+    for workers in (1, 4):
+        archive = tmp_path / f"merged{workers}.jwlibrary"
+        zip_merged_folder(str(merged_dir), str(archive), workers)
+        archives.append(archive.read_bytes())
+        # The manifest is written straight into the archive
+        assert not (merged_dir / "manifest.json").exists()
+
+    check_archive(archives[0])
+    with zipfile.ZipFile(io.BytesIO(archives[1])) as zip_ref:
+        infos = {info.filename: info for info in zip_ref.infolist()}
+        assert infos["text11.txt"].compress_type == zipfile.ZIP_DEFLATED
+        assert infos["photo11.jpg"].compress_type == zipfile.ZIP_STORED
+        assert zip_ref.read("text11.txt") == TEXT * 12
+    # The manifest dates differ, but the members are the same and in the same order
+    members = []
+    for archive in archives:
+        with zipfile.ZipFile(io.BytesIO(archive)) as zip_ref:
+            members.append([(info.filename, info.CRC, info.compress_size) for info in zip_ref.infolist()
+                            if info.filename != "manifest.json"])
+    assert members[0] == members[1]